@@ -43,11 +43,13 @@ def run_migrations_offline() -> None:
         context.run_migrations()
 
 
-def run_migrations_online() -> None:
-    configuration = config.get_section(config.config_ini_section) or {}
-    configuration["sqlalchemy.url"] = get_url()
+def shard_urls() -> list[str]:
+    return [u.strip() for u in settings.EVENT_SHARD_URLS.split(",") if u.strip()]
 
-    config.set_main_option("sqlalchemy.url", settings.DATABASE_URL)
+
+def _migrate(url: str) -> None:
+    configuration = config.get_section(config.config_ini_section) or {}
+    configuration["sqlalchemy.url"] = url
 
     connectable = engine_from_config(
         configuration,
@@ -66,6 +68,20 @@ def run_migrations_online() -> None:
             context.run_migrations()
 
 
+def run_migrations_online() -> None:
+    config.set_main_option("sqlalchemy.url", settings.DATABASE_URL)
+
+    # Primary first, then every event shard (same revisions; shard-only steps
+    # check config.attributes["event_shard"])
+    config.attributes["event_shard"] = None
+    _migrate(get_url())
+
+    urls = shard_urls()
+    for index, url in enumerate(urls):
+        config.attributes["event_shard"] = (index, len(urls))
+        _migrate(url)
+
+
 if context.is_offline_mode():
     run_migrations_offline()
 else:
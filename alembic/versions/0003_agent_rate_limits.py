@@ -0,0 +1,24 @@
+"""add per-agent ingest rate limits
+
+Revision ID: 0003_agent_rate_limits
+Revises: 0002_add_users_site_id
+Create Date: 2026-10-19
+"""
+from __future__ import annotations
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003_agent_rate_limits"
+down_revision = "0002_add_users_site_id"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("agents", sa.Column("rate_limit_per_sec", sa.Float(), nullable=True))
+    op.add_column("agents", sa.Column("rate_limit_burst", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("agents", "rate_limit_burst")
+    op.drop_column("agents", "rate_limit_per_sec")
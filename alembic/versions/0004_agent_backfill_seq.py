@@ -0,0 +1,25 @@
+"""add agents.backfill_seq watermark
+
+Revision ID: 0004_agent_backfill_seq
+Revises: 0003_agent_rate_limits
+Create Date: 2026-10-19
+"""
+from __future__ import annotations
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004_agent_backfill_seq"
+down_revision = "0003_agent_rate_limits"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "agents",
+        sa.Column("backfill_seq", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("agents", "backfill_seq")
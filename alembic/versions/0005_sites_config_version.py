@@ -0,0 +1,25 @@
+"""add sites.config_version
+
+Revision ID: 0005_sites_config_version
+Revises: 0004_agent_backfill_seq
+Create Date: 2026-10-19
+"""
+from __future__ import annotations
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_sites_config_version"
+down_revision = "0004_agent_backfill_seq"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "sites",
+        sa.Column("config_version", sa.Integer(), nullable=False, server_default="0"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("sites", "config_version")
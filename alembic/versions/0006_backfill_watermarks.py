@@ -0,0 +1,40 @@
+"""move backfill watermark next to the events it guards
+
+Revision ID: 0006_backfill_watermarks
+Revises: 0005_sites_config_version
+Create Date: 2026-10-19
+"""
+from __future__ import annotations
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006_backfill_watermarks"
+down_revision = "0005_sites_config_version"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # No FK to agents: with event sharding this table lives on the event shard,
+    # where it must commit atomically with the backfilled rows
+    op.create_table(
+        "backfill_watermarks",
+        sa.Column("agent_id", sa.Integer(), primary_key=True),
+        sa.Column("seq", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+    op.execute(
+        "INSERT INTO backfill_watermarks (agent_id, seq) "
+        "SELECT id, backfill_seq FROM agents WHERE backfill_seq > 0"
+    )
+    op.drop_column("agents", "backfill_seq")
+
+
+def downgrade() -> None:
+    op.add_column(
+        "agents",
+        sa.Column("backfill_seq", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+    op.execute(
+        "UPDATE agents SET backfill_seq = w.seq FROM backfill_watermarks w WHERE w.agent_id = agents.id"
+    )
+    op.drop_table("backfill_watermarks")
@@ -0,0 +1,62 @@
+"""prepare event shard databases
+
+Revision ID: 0007_event_shards
+Revises: 0006_backfill_watermarks
+Create Date: 2026-10-19
+
+Runs on every database (see alembic/env.py); only does work on event shards.
+Shards keep events/evidence for their sites but not cameras/users, so the
+cross-table FKs go, and each shard hands out event ids congruent to its
+index modulo the shard count so an id alone identifies its shard.
+"""
+from __future__ import annotations
+from alembic import context, op
+
+revision = "0007_event_shards"
+down_revision = "0006_backfill_watermarks"
+branch_labels = None
+depends_on = None
+
+
+def _shard():
+    return context.config.attributes.get("event_shard")
+
+
+def upgrade() -> None:
+    shard = _shard()
+    if shard is None:
+        return
+    index, count = shard
+
+    op.drop_constraint("events_camera_id_fkey", "events", type_="foreignkey")
+    op.drop_constraint("events_handled_by_user_id_fkey", "events", type_="foreignkey")
+
+    # next id > max(id) with id % count == (index + 1) % count, matching app/shards.py
+    op.execute(
+        f"""
+        DO $$
+        DECLARE m bigint;
+        BEGIN
+            SELECT COALESCE(MAX(id), 0) INTO m FROM events;
+            m := m + 1;
+            m := m + ((({index} + 1) - m) % {count} + {count}) % {count};
+            EXECUTE 'ALTER SEQUENCE events_id_seq INCREMENT BY {count} RESTART WITH ' || m;
+        END $$;
+        """
+    )
+
+
+def downgrade() -> None:
+    shard = _shard()
+    if shard is None:
+        return
+
+    op.execute("ALTER SEQUENCE events_id_seq INCREMENT BY 1")
+    op.create_foreign_key(
+        "events_handled_by_user_id_fkey", "events", "users",
+        ["handled_by_user_id"], ["id"], ondelete="SET NULL",
+    )
+    op.create_foreign_key(
+        "events_camera_id_fkey", "events", "cameras",
+        ["camera_id"], ["id"], ondelete="CASCADE",
+    )
@@ -0,0 +1,34 @@
+"""guest versions and soft delete for agent delta sync
+
+Revision ID: 0008_guest_versions
+Revises: 0007_event_shards
+Create Date: 2026-10-19
+"""
+from __future__ import annotations
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008_guest_versions"
+down_revision = "0007_event_shards"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "sites",
+        sa.Column("guest_version", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+    op.add_column(
+        "guests",
+        sa.Column("version", sa.BigInteger(), nullable=False, server_default="0"),
+    )
+    op.add_column("guests", sa.Column("deleted_at", sa.DateTime(), nullable=True))
+    op.create_index("ix_guests_site_version", "guests", ["site_id", "version"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_guests_site_version", table_name="guests")
+    op.drop_column("guests", "deleted_at")
+    op.drop_column("guests", "version")
+    op.drop_column("sites", "guest_version")
@@ -0,0 +1,29 @@
+"""site occupancy snapshots
+
+Revision ID: 0009_site_occupancy
+Revises: 0008_guest_versions
+Create Date: 2026-10-19
+"""
+from __future__ import annotations
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009_site_occupancy"
+down_revision = "0008_guest_versions"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "site_occupancy",
+        sa.Column("site_id", sa.Integer(), sa.ForeignKey("sites.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("present_json", sa.Text(), nullable=False, server_default="{}"),
+        sa.Column("anonymous", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("last_event_id", sa.BigInteger(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("site_occupancy")
@@ -0,0 +1,29 @@
+"""per-camera escalation deadline, index of open events
+
+Revision ID: 0010_event_escalation
+Revises: 0009_site_occupancy
+Create Date: 2026-10-19
+"""
+from __future__ import annotations
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010_event_escalation"
+down_revision = "0009_site_occupancy"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # NULL = per-type / global default from settings
+    op.add_column("cameras", sa.Column("escalation_seconds", sa.Integer(), nullable=True))
+    # the escalation scheduler rebuilds from open events at startup
+    op.create_index(
+        "ix_events_open_ts", "events", ["ts"],
+        postgresql_where=sa.text("status = 'open'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_events_open_ts", table_name="events")
+    op.drop_column("cameras", "escalation_seconds")
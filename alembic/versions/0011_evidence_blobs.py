@@ -0,0 +1,39 @@
+"""content-addressed evidence blobs with reference counts
+
+Revision ID: 0011_evidence_blobs
+Revises: 0010_event_escalation
+Create Date: 2026-10-19
+
+Lives next to evidence on every database (each event shard counts its own references).
+"""
+from __future__ import annotations
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0011_evidence_blobs"
+down_revision = "0010_event_escalation"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "evidence_blobs",
+        sa.Column("sha256", sa.String(64), primary_key=True),
+        sa.Column("object_key", sa.Text(), nullable=False),
+        sa.Column("size", sa.BigInteger(), nullable=False),
+        sa.Column("refcount", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index(
+        "ix_evidence_blobs_unreferenced", "evidence_blobs", ["sha256"],
+        postgresql_where=sa.text("refcount <= 0"),
+    )
+    # NULL for frames stored before deduplication (uuid keys, one object per row)
+    op.add_column("evidence", sa.Column("sha256", sa.String(64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("evidence", "sha256")
+    op.drop_index("ix_evidence_blobs_unreferenced", table_name="evidence_blobs")
+    op.drop_table("evidence_blobs")
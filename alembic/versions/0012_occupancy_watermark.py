@@ -0,0 +1,37 @@
+"""event insert time, occupancy replays by time watermark instead of max event id
+
+Revision ID: 0012_occupancy_watermark
+Revises: 0011_evidence_blobs
+Create Date: 2026-10-19
+"""
+from __future__ import annotations
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0012_occupancy_watermark"
+down_revision = "0011_evidence_blobs"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # existing rows get the migration time
+    op.add_column("events", sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()))
+    op.create_index("ix_events_camera_created", "events", ["camera_id", "created_at"])
+
+    # snapshots keyed by event id can't be translated; each site is reseeded from recent history on load
+    op.execute("DELETE FROM site_occupancy")
+    op.drop_column("site_occupancy", "last_event_id")
+    op.add_column("site_occupancy", sa.Column(
+        "watermark", sa.DateTime(), nullable=False, server_default=sa.text("'1970-01-01'"),
+    ))
+    op.add_column("site_occupancy", sa.Column("applied_json", sa.Text(), nullable=False, server_default="[]"))
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM site_occupancy")
+    op.drop_column("site_occupancy", "applied_json")
+    op.drop_column("site_occupancy", "watermark")
+    op.add_column("site_occupancy", sa.Column("last_event_id", sa.BigInteger(), nullable=False, server_default="0"))
+    op.drop_index("ix_events_camera_created", table_name="events")
+    op.drop_column("events", "created_at")
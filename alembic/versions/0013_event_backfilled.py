@@ -0,0 +1,22 @@
+"""mark backfilled events so they are never escalated live
+
+Revision ID: 0013_event_backfilled
+Revises: 0012_occupancy_watermark
+Create Date: 2026-10-19
+"""
+from __future__ import annotations
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0013_event_backfilled"
+down_revision = "0012_occupancy_watermark"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("events", sa.Column("backfilled", sa.Boolean(), nullable=False, server_default=sa.text("false")))
+
+
+def downgrade() -> None:
+    op.drop_column("events", "backfilled")
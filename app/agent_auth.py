@@ -1,24 +1,65 @@
+import hashlib
+import time
+from typing import Dict, Tuple
+
 from fastapi import Header, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import get_db
+from app.db import get_async_db
+from app.liveness import agent_liveness
 from app.security import verify_password
+from app.settings import settings
+from app.tracing import span
 from db.models import Agent
 
+# agent_id -> (sha256(key), api_key_hash it was verified against, expires_at)
+_verified: Dict[int, Tuple[bytes, str, float]] = {}
+
+
+def _key_digest(key: str) -> bytes:
+    return hashlib.sha256(key.encode()).digest()
+
+
+async def _check_key(ag: Agent, key: str) -> bool:
+    # argon2 is deliberately slow; agents present the same key on every poll,
+    # so remember a successful verification for a short while
+    ttl = settings.AGENT_AUTH_CACHE_SECONDS
+    digest = _key_digest(key)
+    now = time.monotonic()
+
+    hit = _verified.get(ag.id)
+    if hit and hit[0] == digest and hit[1] == ag.api_key_hash and hit[2] > now:
+        return True
+
+    # argon2 burns CPU for tens of ms; keep it off the event loop
+    with span("auth.argon2"):
+        ok = await run_in_threadpool(verify_password, key, ag.api_key_hash)
+    if not ok:
+        return False
+    if ttl > 0:
+        _verified[ag.id] = (digest, ag.api_key_hash, now + ttl)
+    return True
+
 
-def get_current_agent(
+async def get_current_agent(
     x_agent_id: int | None = Header(default=None, alias="X-Agent-Id"),
     x_agent_key: str | None = Header(default=None, alias="X-Agent-Key"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Agent:
     if x_agent_id is None or not x_agent_key:
         raise HTTPException(401, "Missing agent headers")
 
-    ag = db.get(Agent, x_agent_id)
-    if not ag or not ag.api_key_hash:
-        raise HTTPException(401, "Invalid agent")
+    with span("auth.agent", agent_id=x_agent_id):
+        ag = await db.get(Agent, x_agent_id)
+        # end the read transaction: hands the connection back to the pool without
+        # expiring `ag` (expire_on_commit=False)
+        await db.commit()
+        if not ag or not ag.api_key_hash:
+            raise HTTPException(401, "Invalid agent")
 
-    if not verify_password(x_agent_key, ag.api_key_hash):
-        raise HTTPException(401, "Invalid agent key")
+        if not await _check_key(ag, x_agent_key):
+            raise HTTPException(401, "Invalid agent key")
 
-    return ag
\ No newline at end of file
+    await agent_liveness.seen(ag.id, ag.site_id)
+    return ag
@@ -0,0 +1,159 @@
+import json
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+from pydantic import BaseModel, Field, ValidationError
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.shards import shard_router
+from db.models import BackfillWatermark
+
+
+class BackfillError(Exception):
+    pass
+
+
+class BackfillEventIn(BaseModel):
+    # agent-side monotonically increasing sequence number
+    seq: int
+    camera_id: int
+    ts: datetime
+    # limits match the events columns, so an oversized value is a 400 for its line, not a DB error
+    type: str = Field(max_length=32)
+    person_name: Optional[str] = Field(default=None, max_length=200)
+    similarity: Optional[float] = None
+    status: str = Field(default="open", max_length=16)
+    # evidence_b64 is not accepted here; backfill carries metadata only
+
+
+class NDJSONDecoder:
+    """
+    Incremental (optionally gzip) NDJSON decoder: feed body chunks as they
+    arrive, get complete lines back. Only the current partial line is held.
+    """
+
+    def __init__(self, gzipped: bool, max_line_bytes: int):
+        self._zlib = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS) if gzipped else None
+        self._buf = b""
+        self._max_line = max_line_bytes
+
+    def feed(self, chunk: bytes) -> Iterator[bytes]:
+        if self._zlib is not None:
+            try:
+                # bound the output per call so a tiny chunk cannot inflate without limit
+                data = self._zlib.decompress(chunk, self._max_line)
+                while self._zlib.unconsumed_tail:
+                    yield from self._split(data)
+                    data = self._zlib.decompress(self._zlib.unconsumed_tail, self._max_line)
+            except zlib.error as e:
+                raise BackfillError(f"Invalid gzip body: {e}") from e
+        else:
+            data = chunk
+        yield from self._split(data)
+
+    def close(self) -> Iterator[bytes]:
+        if self._zlib is not None:
+            yield from self._split(self._zlib.flush())
+            if not self._zlib.eof:
+                raise BackfillError("Truncated gzip body")
+        if self._buf.strip():
+            yield self._buf
+        self._buf = b""
+
+    def _split(self, data: bytes) -> Iterator[bytes]:
+        if not data:
+            return
+        buf = self._buf + data
+        start = 0
+        while True:
+            nl = buf.find(b"\n", start)
+            if nl < 0:
+                break
+            line = buf[start:nl]
+            start = nl + 1
+            if line.strip():
+                yield line
+        self._buf = buf[start:]
+        if len(self._buf) > self._max_line:
+            raise BackfillError("NDJSON line too long")
+
+
+def parse_line(line: bytes) -> BackfillEventIn:
+    try:
+        return BackfillEventIn.model_validate(json.loads(line))
+    except (ValueError, ValidationError) as e:
+        raise BackfillError(f"Invalid NDJSON row: {e}") from e
+
+
+def _naive_utc(ts: datetime) -> datetime:
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+_STAGE_DDL = """
+CREATE TEMP TABLE IF NOT EXISTS events_backfill_stage (
+    seq bigint NOT NULL,
+    camera_id integer NOT NULL,
+    ts timestamp NOT NULL,
+    type varchar(32) NOT NULL,
+    person_name varchar(200),
+    similarity double precision,
+    status varchar(16) NOT NULL
+) ON COMMIT DELETE ROWS
+"""
+
+_MERGE = """
+INSERT INTO events (camera_id, ts, type, person_name, similarity, status, backfilled)
+SELECT camera_id, ts, type, person_name, similarity, status, true
+FROM events_backfill_stage
+WHERE seq > %(acked)s
+ORDER BY seq
+"""
+
+
+def get_watermark(agent_id: int, site_id: int) -> int:
+    with shard_router.for_site(site_id).Session() as db:
+        seq = db.execute(select(BackfillWatermark.seq).where(BackfillWatermark.agent_id == agent_id)).scalar()
+    return seq or 0
+
+
+def load_chunk(agent_id: int, site_id: int, rows: List[BackfillEventIn], last_seq: int) -> Dict[str, Any]:
+    """
+    COPY one chunk into a per-connection staging table, merge it into events
+    and advance the agent watermark to `last_seq`, all in one transaction on
+    the site's event shard. An interrupted upload therefore resumes exactly
+    after the last chunk.
+    """
+    with shard_router.for_site(site_id).Session() as db:
+        # Row lock serializes concurrent uploads from the same agent
+        db.execute(pg_insert(BackfillWatermark).values(agent_id=agent_id, seq=0).on_conflict_do_nothing())
+        acked = db.execute(
+            select(BackfillWatermark.seq).where(BackfillWatermark.agent_id == agent_id).with_for_update()
+        ).scalar_one()
+        if last_seq <= acked:
+            db.rollback()
+            return {"inserted": 0, "acked_seq": acked}
+
+        conn = db.connection()
+        conn.exec_driver_sql(_STAGE_DDL)
+
+        raw = conn.connection.driver_connection
+        with raw.cursor() as cur:
+            with cur.copy(
+                "COPY events_backfill_stage (seq, camera_id, ts, type, person_name, similarity, status) FROM STDIN"
+            ) as cp:
+                for r in rows:
+                    cp.write_row((r.seq, r.camera_id, _naive_utc(r.ts), r.type, r.person_name, r.similarity, r.status))
+
+            cur.execute(_MERGE, {"acked": acked})
+            inserted = cur.rowcount
+
+        db.execute(
+            update(BackfillWatermark).where(BackfillWatermark.agent_id == agent_id).values(seq=last_seq)
+        )
+        db.commit()
+
+    return {"inserted": inserted, "acked_seq": last_seq}
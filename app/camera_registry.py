@@ -0,0 +1,158 @@
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db import SessionLocal
+from app.replicas import replica_router
+from app.settings import settings
+from db.models import Camera, Site
+
+
+class CameraMeta:
+    __slots__ = ("id", "site_id", "name", "role", "stream_url", "enabled", "created_at", "escalation_seconds")
+
+    def __init__(self, id: int, site_id: int, name: str, role: str,
+                 stream_url: Optional[str], enabled: bool, created_at: datetime,
+                 escalation_seconds: Optional[int] = None):
+        self.id = id
+        self.site_id = site_id
+        self.name = name
+        self.role = role
+        self.stream_url = stream_url
+        self.enabled = enabled
+        self.created_at = created_at
+        self.escalation_seconds = escalation_seconds
+
+    @classmethod
+    def from_row(cls, c) -> "CameraMeta":
+        return cls(c.id, c.site_id, c.name, c.role, c.stream_url, c.enabled, c.created_at, c.escalation_seconds)
+
+
+_COLUMNS = (
+    Camera.id, Camera.site_id, Camera.name, Camera.role, Camera.stream_url, Camera.enabled, Camera.created_at,
+    Camera.escalation_seconds,
+)
+
+
+class CameraRegistry:
+    """
+    Process-wide copy of the cameras table (it is small and rarely written).
+
+    Writes in this process update it directly via put(). Writes from other
+    workers are noticed by comparing the sum of sites.config_version, which
+    every camera write bumps, at most every CAMERA_REGISTRY_CHECK_SECONDS.
+    Readers never lock: the maps are swapped or updated atomically.
+    Reloads and misses always read the primary, even when the caller holds a
+    replica session: a lagging replica could resurrect a disabled camera,
+    and ingest authorizes against this copy.
+    """
+
+    def __init__(self, check_seconds: float):
+        self.check_seconds = check_seconds
+        self._cams: Dict[int, CameraMeta] = {}
+        self._by_site: Dict[int, Tuple[int, ...]] = {}
+        self._version: Optional[Tuple[int, int]] = None
+        self._checked_at = 0.0
+        self._reload_lock = threading.Lock()
+
+    @staticmethod
+    def _db_version(db: Session) -> Tuple[int, int]:
+        total, n = db.execute(select(func.coalesce(func.sum(Site.config_version), 0), func.count(Site.id))).one()
+        return int(total), int(n)
+
+    def reload(self, db: Optional[Session] = None):
+        if db is None:
+            with SessionLocal() as s:
+                return self.reload(s)
+
+        with self._reload_lock:
+            version = self._db_version(db)
+            cams: Dict[int, CameraMeta] = {}
+            by_site: Dict[int, list] = {}
+            for row in db.execute(select(*_COLUMNS).order_by(Camera.id.asc())):
+                meta = CameraMeta.from_row(row)
+                cams[meta.id] = meta
+                by_site.setdefault(meta.site_id, []).append(meta.id)
+
+            self._cams = cams
+            self._by_site = {k: tuple(v) for k, v in by_site.items()}
+            self._version = version
+            self._checked_at = time.monotonic()
+
+    def is_fresh(self) -> bool:
+        return self._version is not None and time.monotonic() - self._checked_at < self.check_seconds
+
+    @staticmethod
+    def _on_replica(db: Session) -> bool:
+        bind = db.get_bind()
+        return any(bind is r.engine for r in replica_router.replicas)
+
+    def _ensure_fresh(self, db: Session):
+        if self.is_fresh():
+            return
+        if self._on_replica(db):
+            with SessionLocal() as s:
+                return self._ensure_fresh(s)
+        if self._version is None or self._db_version(db) != self._version:
+            self.reload(db)
+        else:
+            self._checked_at = time.monotonic()
+
+    def put(self, cam: Camera):
+        """Write-path invalidation: call after committing a camera create/update."""
+        meta = CameraMeta.from_row(cam)
+        old = self._cams.get(meta.id)
+        self._cams[meta.id] = meta
+        if old is None or old.site_id != meta.site_id:
+            if old is not None:
+                self._by_site[old.site_id] = tuple(i for i in self._by_site.get(old.site_id, ()) if i != meta.id)
+            self._by_site[meta.site_id] = tuple(sorted(self._by_site.get(meta.site_id, ()) + (meta.id,)))
+        # every camera write bumps its site's config_version by one; account for
+        # ours so only writes from other workers trigger a reload
+        if self._version is not None:
+            self._version = (self._version[0] + 1, self._version[1])
+
+    def get(self, db: Session, camera_id: int) -> Optional[CameraMeta]:
+        self._ensure_fresh(db)
+        meta = self._cams.get(camera_id)
+        if meta is None:
+            if self._on_replica(db):
+                with SessionLocal() as s:
+                    return self.get(s, camera_id)
+            # created by another worker since the last check
+            row = db.execute(select(*_COLUMNS).where(Camera.id == camera_id)).first()
+            if row is None:
+                return None
+            meta = CameraMeta.from_row(row)
+            self._cams[meta.id] = meta
+            self._by_site[meta.site_id] = tuple(sorted(set(self._by_site.get(meta.site_id, ())) | {meta.id}))
+        return meta
+
+    async def aget(self, db: AsyncSession, camera_id: int) -> Optional[CameraMeta]:
+        # Pure memory on the hot path; only a refresh or miss touches the DB
+        if self.is_fresh():
+            meta = self._cams.get(camera_id)
+            if meta is not None:
+                return meta
+        return await db.run_sync(self.get, camera_id)
+
+    def site_camera_ids(self, db: Session, site_id: int) -> Tuple[int, ...]:
+        self._ensure_fresh(db)
+        return self._by_site.get(site_id, ())
+
+    async def asite_camera_ids(self, db: AsyncSession, site_id: int) -> Tuple[int, ...]:
+        if not self.is_fresh():
+            await db.run_sync(self._ensure_fresh)
+        return self._by_site.get(site_id, ())
+
+    def site_cameras(self, db: Session, site_id: int) -> list[CameraMeta]:
+        self._ensure_fresh(db)
+        return [self._cams[i] for i in self._by_site.get(site_id, ()) if i in self._cams]
+
+
+camera_registry = CameraRegistry(settings.CAMERA_REGISTRY_CHECK_SECONDS)
@@ -0,0 +1,56 @@
+import asyncio
+from typing import Dict, List, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from db.models import Site
+
+
+def bump_config_version(db: Session, site_id: int) -> None:
+    # Same transaction as the camera write; caller commits
+    db.execute(update(Site).where(Site.id == site_id).values(config_version=Site.config_version + 1))
+
+
+async def get_config_version(db: AsyncSession, site_id: int) -> int:
+    res = await db.execute(select(Site.config_version).where(Site.id == site_id))
+    return res.scalar_one_or_none() or 0
+
+
+def config_etag(site_id: int, version: int) -> str:
+    return f'"cfg-{site_id}-{version}"'
+
+
+class ConfigNotifier:
+    """
+    Wakes /agent/config long-polls in this process when a site's cameras change.
+    Other workers' changes are picked up by the poller's periodic re-check.
+    """
+
+    def __init__(self):
+        self._waiters: Dict[int, List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]]] = {}
+
+    async def wait(self, site_id: int, timeout: float) -> bool:
+        ev = asyncio.Event()
+        entry = (asyncio.get_running_loop(), ev)
+        self._waiters.setdefault(site_id, []).append(entry)
+        try:
+            await asyncio.wait_for(ev.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            waiters = self._waiters.get(site_id)
+            if waiters and entry in waiters:
+                waiters.remove(entry)
+                if not waiters:
+                    self._waiters.pop(site_id, None)
+
+    def notify(self, site_id: int) -> None:
+        # Called from sync routes (threadpool), so hop onto the waiter's loop
+        for loop, ev in self._waiters.pop(site_id, []):
+            loop.call_soon_threadsafe(ev.set)
+
+
+config_notifier = ConfigNotifier()
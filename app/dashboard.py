@@ -0,0 +1,97 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import orjson
+from sqlalchemy import func, select
+
+from app.camera_registry import camera_registry
+from app.fastpath import EVENT_COLUMNS, SITE_COLUMNS
+from app.occupancy import occupancy
+from app.replicas import replica_router
+from app.settings import settings
+from app.shards import shard_router
+from db.models import Agent, Event, Site
+
+AGENT_COLUMNS = (Agent.id, Agent.name, Agent.version, Agent.last_seen)
+
+
+class SnapshotCache:
+    """
+    Pre-encoded dashboard snapshot per site, shared by everyone looking at
+    that site and recomputed at most every DASHBOARD_SNAPSHOT_TTL seconds.
+    Concurrent misses for a site wait on one computation instead of each
+    running their own.
+    """
+
+    def __init__(self):
+        # site_id -> (computed at, JSON body)
+        self._entries: Dict[int, Tuple[float, bytes]] = {}
+        self._locks: Dict[int, threading.Lock] = {}
+        self._guard = threading.Lock()
+        self.computed = 0
+
+    def _fresh(self, site_id: int) -> Optional[bytes]:
+        hit = self._entries.get(site_id)
+        if hit is not None and time.monotonic() - hit[0] < settings.DASHBOARD_SNAPSHOT_TTL:
+            return hit[1]
+        return None
+
+    def get(self, site_id: int) -> Optional[bytes]:
+        """Snapshot JSON for the site, or None if it does not exist."""
+        body = self._fresh(site_id)
+        if body is not None:
+            return body
+        with self._guard:
+            lock = self._locks.setdefault(site_id, threading.Lock())
+        with lock:
+            # whoever held the lock may have just refreshed it
+            body = self._fresh(site_id)
+            if body is None:
+                body = self._compute(site_id)
+                if body is None:
+                    return None
+                self._entries[site_id] = (time.monotonic(), body)
+                self.computed += 1
+        return body
+
+    def _compute(self, site_id: int) -> Optional[bytes]:
+        with replica_router.read_session() as db:
+            site = db.execute(select(*SITE_COLUMNS).where(Site.id == site_id)).first()
+            if site is None:
+                return None
+            agents = db.execute(select(*AGENT_COLUMNS).where(Agent.site_id == site_id).order_by(Agent.id)).all()
+            cams = camera_registry.site_cameras(db, site_id)
+
+        cam_ids = [c.id for c in cams]
+        open_counts: Dict[int, int] = {}
+        recent = []
+        if cam_ids:
+            with shard_router.read_session(shard_router.for_site(site_id)) as edb:
+                open_counts = dict(edb.execute(
+                    select(Event.camera_id, func.count())
+                    .where(Event.camera_id.in_(cam_ids), Event.status == "open")
+                    .group_by(Event.camera_id)
+                ).all())
+                recent = edb.execute(
+                    select(*EVENT_COLUMNS)
+                    .where(Event.camera_id.in_(cam_ids))
+                    .order_by(Event.ts.desc())
+                    .limit(settings.DASHBOARD_RECENT_EVENTS)
+                ).all()
+
+        return orjson.dumps({
+            "site": site._asdict(),
+            "cameras": [
+                {s: getattr(c, s) for s in c.__slots__} | {"open_events": open_counts.get(c.id, 0)}
+                for c in cams
+            ],
+            "agents": [a._asdict() for a in agents],
+            "open_events": sum(open_counts.values()),
+            "recent_events": [e._asdict() for e in recent],
+            "occupancy": occupancy.get(site_id).as_dict(names=False),
+            "generated_at": time.time(),
+        })
+
+
+snapshot_cache = SnapshotCache()
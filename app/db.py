@@ -1,15 +1,156 @@
-from sqlalchemy import create_engine
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from app.settings import settings
 
-engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True)
+
+class PoolStats:
+    """Counters fed by pool events plus checkout wait time measured in the pool."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidations = 0
+        self.pings = 0
+        self.timeouts = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._lock = threading.Lock()
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        pool = self.pool
+        return {
+            "size": pool.size() if pool else 0,
+            "checked_out": pool.checkedout() if pool else 0,
+            "checked_in": pool.checkedin() if pool else 0,
+            "overflow": max(0, pool.overflow()) if pool else 0,
+            "connects": self.connects,
+            "checkouts": self.checkouts,
+            "invalidations": self.invalidations,
+            "idle_pings": self.pings,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": round(1000 * self.wait_total / self.wait_count, 3) if self.wait_count else 0.0,
+            "wait_max_ms": round(1000 * self.wait_max, 3),
+        }
+
+
+pool_stats: Dict[str, PoolStats] = {}
+
+
+def _timed_pool(base: type, stats: PoolStats) -> type:
+    # Pools get recreated on dispose() via self.__class__, so the stats ride on the class
+    class TimedPool(base):
+        def _do_get(self):
+            stats.pool = self
+            t0 = time.perf_counter()
+            try:
+                conn = super()._do_get()
+            except exc.TimeoutError:
+                stats.record_wait(time.perf_counter() - t0, timed_out=True)
+                raise
+            stats.record_wait(time.perf_counter() - t0)
+            return conn
+
+    TimedPool.__name__ = f"Timed{base.__name__}"
+    return TimedPool
+
+
+def _instrument(engine: Engine, stats: PoolStats) -> None:
+    ping_idle = settings.DB_PRE_PING == "idle"
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, record):
+        stats.connects += 1
+
+    @event.listens_for(engine, "checkin")
+    def _on_checkin(dbapi_conn, record):
+        record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(engine, "invalidate")
+    def _on_invalidate(dbapi_conn, record, exception):
+        stats.invalidations += 1
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_conn, record, proxy):
+        stats.checkouts += 1
+        if not ping_idle:
+            return
+        # Ping only connections that sat idle long enough to have been dropped
+        # by a firewall/pgbouncer, instead of a round-trip on every checkout
+        idle_since = record.info.get("checked_in_at")
+        if idle_since is None or time.monotonic() - idle_since < settings.DB_PRE_PING_IDLE_SECONDS:
+            return
+        stats.pings += 1
+        try:
+            ok = engine.dialect.do_ping(dbapi_conn)
+        except Exception:
+            ok = False
+        if not ok:
+            # the pool discards this connection and retries with a fresh one
+            raise exc.DisconnectionError()
+
+
+def _pool_kwargs(name: str, base_pool: type) -> Dict[str, Any]:
+    stats = pool_stats[name] = PoolStats(name)
+    return {
+        "poolclass": _timed_pool(base_pool, stats),
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_PRE_PING == "always",
+    }
+
+
+def make_engine(url: str, name: str = "sync") -> Engine:
+    """The one place engines are built; pool sizing comes from Settings."""
+    engine = create_engine(url, **_pool_kwargs(name, QueuePool))
+    _instrument(engine, pool_stats[name])
+    return engine
+
+
+def make_async_engine(url: str, name: str = "async"):
+    engine = create_async_engine(url, **_pool_kwargs(name, AsyncAdaptedQueuePool))
+    _instrument(engine.sync_engine, pool_stats[name])
+    return engine
+
+
+# Sync engine: sync routes (run in the threadpool), scripts, Alembic
+engine = make_engine(settings.DATABASE_URL)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+# Async engine (psycopg async): async routes and auth dependencies, so DB I/O
+# never blocks the event loop that also serves WebSockets
+async_engine = make_async_engine(settings.DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -2,9 +2,9 @@ from typing import Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import get_db
+from app.db import get_async_db
 from app.security import decode_token
 from db.models import User
 
@@ -17,7 +17,7 @@ class AuthedUser:
         self.site_id = site_id  # optional guard scope
 
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2)) -> AuthedUser:
+async def get_current_user(db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2)) -> AuthedUser:
     try:
         payload = decode_token(token)
     except ValueError:
@@ -36,7 +36,9 @@ def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2)
     except ValueError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid user")
 
-    user = db.get(User, user_id)
+    user = await db.get(User, user_id)
+    # release the connection; sync routes use their own session from get_db
+    await db.commit()
     if not user or not user.is_active:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found/inactive")
 
@@ -51,7 +53,7 @@ def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2)
 
 
 def require_roles(*roles: str):
-    def _inner(au: AuthedUser = Depends(get_current_user)) -> AuthedUser:
+    async def _inner(au: AuthedUser = Depends(get_current_user)) -> AuthedUser:
         if au.user.role not in roles:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
         return au
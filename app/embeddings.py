@@ -0,0 +1,404 @@
+"""
+Per-site face embedding store: one contiguous matrix file plus an append-only
+index log, memory-mapped for reads.
+
+Files (under EMBEDDINGS_DIR), per site and generation g:
+    site-{id}.json        {"gen", "dim", "dtype", "base", "floor"}, replaced atomically
+    site-{id}.g{g}.mat    rows x dim float16/float32, raw
+    site-{id}.g{g}.idx    IDX_DTYPE records, one per write (row -1 = delete)
+
+Record i of the log has version base + i + 1. The current entry for a person
+is the last record with its (kind, ref). Compaction writes a new generation
+holding only live rows and swaps the JSON last, so readers either see the old
+pair of files or the new one; the old pair is unlinked EMBEDDING_RETIRE_SECONDS
+later. Deltas can be served from any version >= floor.
+
+Agent blob (little-endian): a BLOB_HEADER, then
+    ref int64[n], kind uint8[n], label S64[n], vectors dtype[n x dim]   (upserts)
+    ref int64[m], kind uint8[m]                                         (removals)
+"""
+import fcntl
+import json
+import os
+import re
+import struct
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from app.settings import settings
+
+IDX_DTYPE = np.dtype([("ref", "<i8"), ("kind", "u1"), ("row", "<i8"), ("label", "S64")])
+KINDS = {"guest": 0, "resident": 1}
+_DTYPE_CODES = {"float16": 1, "float32": 2}
+
+BLOB_MAGIC = b"HSEMB\x01\x00\x00"
+# magic, dim, dtype code, full, pad, from_version, version, n_upserts, n_removed
+BLOB_HEADER = struct.Struct("<8sIBBHQQII")
+
+
+class EmbeddingError(Exception):
+    pass
+
+
+class LiveView:
+    """The live rows of one version, gathered into a dense matrix (a copy, not the memmap)."""
+
+    __slots__ = ("version", "ref", "kind", "label", "matrix")
+
+    def __init__(self, version: int, ref: np.ndarray, kind: np.ndarray, label: np.ndarray, matrix: np.ndarray):
+        self.version = version
+        self.ref = ref
+        self.kind = kind
+        self.label = label
+        self.matrix = matrix
+
+
+def _latest(log: np.ndarray) -> np.ndarray:
+    """Positions of the last record per (kind, ref) in the log, in log order."""
+    if len(log) == 0:
+        return np.empty(0, dtype=np.int64)
+    key = log["ref"] * 4 + log["kind"]
+    # unique on the reversed log finds last occurrences
+    _, first_rev = np.unique(key[::-1], return_index=True)
+    return np.sort(len(log) - 1 - first_rev)
+
+
+def _align(f, size: int) -> int:
+    """Records in a file opened for append; cuts a partial one left by a writer that died mid-write."""
+    n, torn = divmod(f.seek(0, os.SEEK_END), size)
+    if torn:
+        f.truncate(n * size)
+    return n
+
+
+class SiteEmbeddings:
+    def __init__(self, root: str, site_id: int, dim: int, dtype: str):
+        self.site_id = site_id
+        self.root = root
+        self._base_path = os.path.join(root, f"site-{site_id}")
+        self._meta_path = self._base_path + ".json"
+        self._new_dim = dim
+        self._new_dtype = dtype
+        self._meta: Optional[dict] = None
+        self._meta_stat: Optional[Tuple[int, int]] = None
+        self._idx_size = -1
+        self._log = np.empty(0, dtype=IDX_DTYPE)
+        self._mat: Optional[np.ndarray] = None
+        self._live: Optional[LiveView] = None
+        # (kind, ref) keys whose current record has a row, folded in from the first `_counted` log records
+        self._live_keys: set = set()
+        self._counted = 0
+        self._lock = threading.RLock()
+        self._flock_depth = 0
+        self.compacting = False
+
+    # ----- files -----
+
+    def _paths(self, gen: int) -> Tuple[str, str]:
+        return f"{self._base_path}.g{gen}.mat", f"{self._base_path}.g{gen}.idx"
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        # serializes writers across worker processes; re-entrant within this one
+        # (callers hold self._lock, and a second flock on a new fd would block)
+        if self._flock_depth:
+            self._flock_depth += 1
+            try:
+                yield
+            finally:
+                self._flock_depth -= 1
+            return
+        with open(self._base_path + ".lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            self._flock_depth = 1
+            try:
+                yield
+            finally:
+                self._flock_depth = 0
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _write_meta(self, meta: dict):
+        tmp = self._meta_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._meta_path)
+
+    def _init_files(self):
+        meta = {"gen": 0, "dim": self._new_dim, "dtype": self._new_dtype, "base": 0, "floor": 0}
+        for p in self._paths(0):
+            open(p, "ab").close()
+        self._write_meta(meta)
+
+    def refresh(self):
+        """Pick up appends and compactions from any process; cheap when nothing changed."""
+        with self._lock:
+            try:
+                st = os.stat(self._meta_path)
+            except FileNotFoundError:
+                with self._file_lock():
+                    if not os.path.exists(self._meta_path):
+                        self._init_files()
+                st = os.stat(self._meta_path)
+
+            if (st.st_ino, st.st_mtime_ns) != self._meta_stat:
+                with open(self._meta_path) as f:
+                    self._meta = json.load(f)
+                self._meta_stat = (st.st_ino, st.st_mtime_ns)
+                self._idx_size = -1
+                self._live_keys = set()
+                self._counted = 0
+
+            mat_path, idx_path = self._paths(self._meta["gen"])
+            size = os.path.getsize(idx_path)
+            if size == self._idx_size:
+                return
+            n = size // IDX_DTYPE.itemsize
+            self._log = np.memmap(idx_path, dtype=IDX_DTYPE, mode="r", shape=(n,)) if n else np.empty(0, dtype=IDX_DTYPE)
+            rows = os.path.getsize(mat_path) // self.row_bytes
+            self._mat = (
+                np.memmap(mat_path, dtype=self.dtype, mode="r", shape=(rows, self.dim))
+                if rows else np.empty((0, self.dim), dtype=self.dtype)
+            )
+            self._idx_size = size
+            self._live = None
+            self._count()
+
+    def _count(self):
+        """Fold log records appended since the last call into the live key set."""
+        tail = np.asarray(self._log[self._counted:])
+        if len(tail) == 0:
+            return
+        # last record per key wins, as in _latest
+        latest = dict(zip((tail["ref"] * 4 + tail["kind"]).tolist(), tail["row"].tolist()))
+        for key, row in latest.items():
+            if row >= 0:
+                self._live_keys.add(key)
+            else:
+                self._live_keys.discard(key)
+        self._counted = len(self._log)
+
+    @property
+    def dim(self) -> int:
+        return self._meta["dim"]
+
+    @property
+    def dtype(self) -> np.dtype:
+        return np.dtype(self._meta["dtype"])
+
+    @property
+    def row_bytes(self) -> int:
+        return self.dim * self.dtype.itemsize
+
+    @property
+    def version(self) -> int:
+        return self._meta["base"] + len(self._log)
+
+    # ----- writes -----
+
+    def _append(self, ref: int, kind: int, label: str, vec: Optional[np.ndarray]) -> int:
+        mat_path, idx_path = self._paths(self._meta["gen"])
+        row = -1
+        if vec is not None:
+            # matrix row first: an index record never points past the matrix
+            with open(mat_path, "ab") as f:
+                row = _align(f, self.row_bytes)
+                f.write(vec.tobytes())
+        rec = np.array([(ref, kind, row, label.encode()[:64])], dtype=IDX_DTYPE)
+        with open(idx_path, "ab") as f:
+            _align(f, IDX_DTYPE.itemsize)
+            f.write(rec.tobytes())
+        self.refresh()
+        return self.version
+
+    def upsert(self, kind: str, ref: int, label: str, vector) -> int:
+        if kind not in KINDS:
+            raise EmbeddingError(f"kind must be one of {sorted(KINDS)}")
+        with self._lock, self._file_lock():
+            self.refresh()
+            vec = np.asarray(vector, dtype=np.float32)
+            if vec.shape != (self.dim,):
+                raise EmbeddingError(f"expected a vector of {self.dim} floats")
+            if not np.isfinite(vec).all():
+                raise EmbeddingError("vector has NaN/inf")
+            version = self._append(ref, KINDS[kind], label, vec.astype(self.dtype))
+        self._maybe_compact()
+        return version
+
+    def delete(self, kind: str, ref: int) -> Optional[int]:
+        """New version, or None if there was nothing live to delete."""
+        if kind not in KINDS:
+            raise EmbeddingError(f"kind must be one of {sorted(KINDS)}")
+        with self._lock, self._file_lock():
+            self.refresh()
+            if ref * 4 + KINDS[kind] not in self._live_keys:
+                return None
+            version = self._append(ref, KINDS[kind], "", None)
+        self._maybe_compact()
+        return version
+
+    # ----- reads -----
+
+    def live(self) -> LiveView:
+        with self._lock:
+            self.refresh()
+            if self._live is not None:
+                return self._live
+            log = self._log
+            pos = _latest(log)
+            pos = pos[log["row"][pos] >= 0]
+            recs = np.asarray(log[pos])
+            self._live = LiveView(
+                self.version, recs["ref"].copy(), recs["kind"].copy(), recs["label"].copy(),
+                np.asarray(self._mat[recs["row"]]),
+            )
+            return self._live
+
+    def dead_fraction(self) -> float:
+        with self._lock:
+            self.refresh()
+            rows = len(self._mat)
+            return 1.0 - len(self._live_keys) / rows if rows else 0.0
+
+    def blob(self, since: Optional[int]) -> Tuple[bytes, int, bool]:
+        """(blob, version, full): everything live, or the changes after `since`."""
+        with self._lock:
+            self.refresh()
+            version = self.version
+            full = since is None or since < self._meta["floor"] or since > version
+            if full:
+                lv = self.live()
+                up_ref, up_kind, up_label, up_mat = lv.ref, lv.kind, lv.label, lv.matrix
+                rm_ref = np.empty(0, dtype="<i8")
+                rm_kind = np.empty(0, dtype="u1")
+                since = 0
+            else:
+                start = since - self._meta["base"]
+                tail = np.asarray(self._log[start:])
+                last = tail[_latest(tail)]
+                ups = last[last["row"] >= 0]
+                rms = last[last["row"] < 0]
+                up_ref, up_kind, up_label = ups["ref"], ups["kind"], ups["label"]
+                up_mat = np.asarray(self._mat[ups["row"]])
+                rm_ref, rm_kind = rms["ref"], rms["kind"]
+
+            header = BLOB_HEADER.pack(
+                BLOB_MAGIC, self.dim, _DTYPE_CODES[self._meta["dtype"]], int(full), 0,
+                since, version, len(up_ref), len(rm_ref),
+            )
+            parts = [
+                header,
+                np.ascontiguousarray(up_ref, dtype="<i8").tobytes(),
+                np.ascontiguousarray(up_kind, dtype="u1").tobytes(),
+                np.ascontiguousarray(up_label, dtype="S64").tobytes(),
+                np.ascontiguousarray(up_mat, dtype=self.dtype.newbyteorder("<")).tobytes(),
+                np.ascontiguousarray(rm_ref, dtype="<i8").tobytes(),
+                np.ascontiguousarray(rm_kind, dtype="u1").tobytes(),
+            ]
+            return b"".join(parts), version, full
+
+    # ----- compaction -----
+
+    def compact(self) -> Dict[str, int]:
+        """
+        Rewrite the site as a new generation holding only live rows. The copy
+        is written without holding the locks; records appended meanwhile are
+        carried over under the file lock, just before the JSON is swapped.
+        """
+        with self._lock:
+            self.refresh()
+            old_gen = self._meta["gen"]
+            lv = self.live()
+            start = len(self._log)
+            before = len(self._mat)
+        n = len(lv.ref)
+        tmp = [f"{p}.{os.getpid()}.{threading.get_ident()}.tmp" for p in self._paths(old_gen + 1)]
+        with open(tmp[0], "wb") as f:
+            f.write(np.ascontiguousarray(lv.matrix, dtype=self.dtype).tobytes())
+        recs = np.empty(n, dtype=IDX_DTYPE)
+        recs["ref"], recs["kind"], recs["label"] = lv.ref, lv.kind, lv.label
+        recs["row"] = np.arange(n)
+        with open(tmp[1], "wb") as f:
+            f.write(recs.tobytes())
+
+        with self._lock, self._file_lock():
+            self.refresh()
+            if self._meta["gen"] != old_gen:
+                # another worker compacted first
+                for p in tmp:
+                    os.unlink(p)
+                return {"rows_before": before, "rows_after": len(self._mat), "version": self.version}
+            tail = np.array(self._log[start:])
+            if len(tail):
+                moved = tail["row"] >= 0
+                with open(tmp[0], "ab") as f:
+                    f.write(np.ascontiguousarray(self._mat[tail["row"][moved]]).tobytes())
+                tail["row"][moved] = n + np.arange(int(moved.sum()))
+                with open(tmp[1], "ab") as f:
+                    f.write(tail.tobytes())
+            gen = old_gen + 1
+            for src, dst in zip(tmp, self._paths(gen)):
+                os.replace(src, dst)
+            self._write_meta({**self._meta, "gen": gen, "base": lv.version - n, "floor": lv.version})
+            self.refresh()
+            self._retire(old_gen)
+            return {"rows_before": before, "rows_after": len(self._mat), "version": self.version}
+
+    def _retire(self, gen: int):
+        """Unlink generation `gen` (and any older one left by a dead worker) after a grace period."""
+        pattern = re.compile(rf"site-{self.site_id}\.g(\d+)\.(mat|idx)$")
+
+        def unlink():
+            for name in os.listdir(self.root):
+                m = pattern.match(name)
+                if m and int(m.group(1)) <= gen:
+                    try:
+                        os.unlink(os.path.join(self.root, name))
+                    except FileNotFoundError:
+                        pass
+
+        timer = threading.Timer(settings.EMBEDDING_RETIRE_SECONDS, unlink)
+        timer.daemon = True
+        timer.start()
+
+    def _maybe_compact(self):
+        with self._lock:
+            if self.compacting or len(self._mat) < settings.EMBEDDING_COMPACT_MIN_ROWS:
+                return
+            if self.dead_fraction() < settings.EMBEDDING_COMPACT_RATIO:
+                return
+            self.compacting = True
+
+        def run():
+            try:
+                self.compact()
+            finally:
+                self.compacting = False
+
+        threading.Thread(target=run, name=f"emb-compact-{self.site_id}", daemon=True).start()
+
+
+class EmbeddingStore:
+    def __init__(self, root: str, dim: int, dtype: str):
+        self.root = root
+        self.dim = dim
+        self.dtype = dtype
+        self._sites: Dict[int, SiteEmbeddings] = {}
+        self._lock = threading.Lock()
+
+    def site(self, site_id: int) -> SiteEmbeddings:
+        s = self._sites.get(site_id)
+        if s is None:
+            with self._lock:
+                s = self._sites.get(site_id)
+                if s is None:
+                    os.makedirs(self.root, exist_ok=True)
+                    s = self._sites[site_id] = SiteEmbeddings(self.root, site_id, self.dim, self.dtype)
+        return s
+
+
+embedding_store = EmbeddingStore(settings.EMBEDDINGS_DIR, settings.EMBEDDING_DIM, settings.EMBEDDING_DTYPE)
@@ -0,0 +1,188 @@
+import asyncio
+import heapq
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.camera_registry import CameraMeta, camera_registry
+from app.db import SessionLocal
+from app.realtime import broadcaster
+from app.settings import settings
+from app.shards import shard_router
+from db.models import Event
+
+log = logging.getLogger(__name__)
+
+
+def _epoch(ts: datetime) -> float:
+    # naive timestamps are UTC
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()
+
+
+def escalation_seconds(cam: CameraMeta, event_type: str) -> int:
+    """Camera override, else per-type setting, else the global default; 0 = never."""
+    if cam.escalation_seconds is not None:
+        return cam.escalation_seconds
+    return settings.ESCALATION_TYPE_SECONDS.get(event_type, settings.ESCALATION_SECONDS)
+
+
+class _Armed:
+    __slots__ = ("deadline", "camera_id", "site_id", "ts", "type", "person_name")
+
+    def __init__(self, deadline: float, camera_id: int, site_id: int, ts: datetime, type: str,
+                 person_name: Optional[str]):
+        self.deadline = deadline
+        self.camera_id = camera_id
+        self.site_id = site_id
+        self.ts = ts
+        self.type = type
+        self.person_name = person_name
+
+
+class EscalationScheduler:
+    """
+    Open events waiting to escalate, in a min-heap of (deadline, event_id).
+    Ingest arms an event, resolving it cancels it (lazily: the heap entry is
+    skipped when it surfaces), and a single task sleeps until the earliest
+    deadline. Before event_escalated goes out the event's status is re-read,
+    since another worker may have handled it.
+
+    At startup the heap is rebuilt from events still open within
+    ESCALATION_LOOKBACK_HOURS (ix_events_open_ts), so every worker escalates
+    those; events ingested afterwards escalate in the worker that took them.
+    Backfilled events are never armed.
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int]] = []
+        self._armed: Dict[int, _Armed] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.escalated = 0
+
+    def arm(self, event_id: int, cam: CameraMeta, ts: datetime, type: str, person_name: Optional[str] = None):
+        secs = escalation_seconds(cam, type)
+        if secs <= 0:
+            return
+        deadline = _epoch(ts) + secs
+        self._armed[event_id] = _Armed(deadline, cam.id, cam.site_id, ts, type, person_name)
+        heapq.heappush(self._heap, (deadline, event_id))
+        if self._heap[0][1] == event_id and self._wake is not None:
+            self._wake.set()
+
+    def cancel(self, event_id: int):
+        if self._armed.pop(event_id, None) is None:
+            return
+        # cancelled entries stay in the heap until they surface; don't let them pile up
+        if len(self._heap) > 2 * len(self._armed) + 1024:
+            self._heap = [(a.deadline, eid) for eid, a in self._armed.items()]
+            heapq.heapify(self._heap)
+
+    def _due(self) -> List[Tuple[int, _Armed]]:
+        now = time.time()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, eid = heapq.heappop(self._heap)
+            a = self._armed.get(eid)
+            if a is not None and a.deadline == deadline:
+                del self._armed[eid]
+                due.append((eid, a))
+        return due
+
+    def _still_open(self, event_ids: List[int]) -> set:
+        by_shard: Dict[int, List[int]] = {}
+        for eid in event_ids:
+            by_shard.setdefault(shard_router.for_event(eid).index, []).append(eid)
+        open_ids = set()
+        for index, ids in by_shard.items():
+            with shard_router.shards[index].Session() as s:
+                open_ids.update(s.scalars(select(Event.id).where(Event.id.in_(ids), Event.status == "open")))
+        return open_ids
+
+    async def _fire(self, due: List[Tuple[int, _Armed]]):
+        try:
+            open_ids = await asyncio.to_thread(self._still_open, [eid for eid, _ in due])
+        except Exception:
+            log.exception("escalation status check failed")
+            open_ids = {eid for eid, _ in due}
+        now = time.time()
+        for eid, a in due:
+            if eid not in open_ids:
+                continue
+            self.escalated += 1
+            await broadcaster.broadcast({
+                "type": "event_escalated",
+                "event": {
+                    "id": eid,
+                    "camera_id": a.camera_id,
+                    "site_id": a.site_id,
+                    "ts": a.ts.isoformat(),
+                    "type": a.type,
+                    "person_name": a.person_name,
+                    "open_seconds": round(now - _epoch(a.ts)),
+                },
+            })
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            timeout = self._heap[0][0] - time.time() if self._heap else None
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=timeout)
+                    # armed something earlier; recompute the sleep
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+            due = self._due()
+            if due:
+                await self._fire(due)
+
+    # ----- startup -----
+
+    def _load_open(self) -> List[Tuple[int, CameraMeta, datetime, str, Optional[str]]]:
+        since = datetime.utcnow() - timedelta(hours=settings.ESCALATION_LOOKBACK_HOURS)
+        q = (
+            select(Event.id, Event.camera_id, Event.ts, Event.type, Event.person_name)
+            # backfilled history keeps its status but never alerts live
+            .where(Event.status == "open", Event.ts >= since, Event.backfilled.is_(False))
+        )
+
+        def fetch(shard):
+            with shard.Session() as s:
+                return s.execute(q).all()
+
+        rows = [r for part in shard_router.scatter(fetch) for r in part]
+        out = []
+        with SessionLocal() as db:
+            for r in rows:
+                cam = camera_registry.get(db, r.camera_id)
+                if cam is not None:
+                    out.append((r.id, cam, r.ts, r.type, r.person_name))
+        return out
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._wake = asyncio.Event()
+        for row in await asyncio.to_thread(self._load_open):
+            self.arm(*row)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+escalations = EscalationScheduler()
@@ -0,0 +1,187 @@
+import base64
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import column, delete, func, select, update, values, Integer, String
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.settings import settings
+from app.shards import Shard, shard_router
+from app.storage import content_key, delete_object, object_exists, put_object, storage_backend
+from db.models import Event, Evidence, EvidenceBlob
+
+log = logging.getLogger(__name__)
+
+
+class Blob:
+    __slots__ = ("digest", "key", "raw", "uploaded")
+
+    def __init__(self, digest: str, key: str, raw: bytes, uploaded: bool):
+        self.digest = digest
+        self.key = key
+        self.raw = raw
+        self.uploaded = uploaded
+
+
+class EvidenceStore:
+    """
+    Content-addressed evidence: a frame is stored once under its sha256 and
+    every Evidence row with that digest holds a reference, counted per shard
+    in evidence_blobs. Consecutive identical frames from a static camera skip
+    the upload when the key is in this process's LRU of stored keys or the
+    digest has a referenced evidence_blobs row. With several shards each one
+    gets its own key space, so one shard's retention never deletes an object
+    another still references.
+
+    Ordering keeps an object present while it is referenced: the refcount is
+    taken in the transaction that inserts the Evidence row, and if that
+    takes the count to 1 (first use, or the blob was purged meanwhile) the
+    object is uploaded again before commit unless put() just uploaded it and
+    it is still there. sweep() deletes objects while holding the row locks of
+    unreferenced blobs, so a concurrent reference waits and re-uploads.
+    """
+
+    def __init__(self):
+        self._known: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key: str):
+        with self._lock:
+            self._known[key] = None
+            self._known.move_to_end(key)
+            while len(self._known) > settings.EVIDENCE_KNOWN_KEYS:
+                self._known.popitem(last=False)
+
+    def _forget(self, key: str):
+        with self._lock:
+            self._known.pop(key, None)
+
+    def _stored(self, shard: Shard, digest: str, key: str) -> bool:
+        with self._lock:
+            if key in self._known:
+                self._known.move_to_end(key)
+                return True
+        with shard.Session() as s:
+            found = s.execute(
+                select(EvidenceBlob.sha256).where(EvidenceBlob.sha256 == digest, EvidenceBlob.refcount > 0)
+            ).first()
+        if found:
+            self._remember(key)
+        return found is not None
+
+    def put(self, evidence_b64: str, shard: Shard, prefix: str = "evidence") -> Optional[Blob]:
+        """Decode and hash a frame, uploading it unless already stored. Blocking."""
+        if storage_backend() is None:
+            return None
+        raw = base64.b64decode(evidence_b64)
+        digest = hashlib.sha256(raw).hexdigest()
+        if shard_router.count > 1:
+            prefix = f"{prefix}/shard{shard.index}"
+        key = content_key(digest, prefix)
+        if self._stored(shard, digest, key):
+            return Blob(digest, key, raw, uploaded=False)
+        put_object(key, raw)
+        return Blob(digest, key, raw, uploaded=True)
+
+    async def attach(self, edb: AsyncSession, event_id: int, blob: Blob):
+        """Add the Evidence row and its blob reference; caller commits."""
+        ins = pg_insert(EvidenceBlob).values(sha256=blob.digest, object_key=blob.key, size=len(blob.raw), refcount=1)
+        refcount = (await edb.execute(
+            ins.on_conflict_do_update(
+                index_elements=[EvidenceBlob.sha256],
+                set_={"refcount": EvidenceBlob.refcount + 1},
+            ).returning(EvidenceBlob.refcount)
+        )).scalar_one()
+        if refcount == 1 and not (blob.uploaded and await run_in_threadpool(object_exists, blob.key)):
+            # first reference, and the object may be gone: known here but purged since, or
+            # uploaded by put() and then swept before this row existed. Put it back before commit
+            await run_in_threadpool(put_object, blob.key, blob.raw)
+        edb.add(Evidence(event_id=event_id, image_key=blob.key, thumb_key=None, annotations_json=None,
+                         sha256=blob.digest))
+        self._remember(blob.key)
+
+    # ----- retention -----
+
+    def purge(self, shard: Shard, before: datetime, batch: int = 1000) -> Dict[str, int]:
+        """Drop evidence of events older than `before`, then blobs nobody references."""
+        rows = 0
+        while True:
+            with shard.Session() as s:
+                # a bounded transaction per batch of events, like sweep()
+                event_ids = s.scalars(
+                    select(Evidence.event_id)
+                    .join(Event, Event.id == Evidence.event_id)
+                    .where(Event.ts < before)
+                    .distinct()
+                    .limit(batch)
+                ).all()
+                if not event_ids:
+                    break
+                gone = s.execute(
+                    delete(Evidence)
+                    .where(Evidence.event_id.in_(event_ids))
+                    .returning(Evidence.sha256, Evidence.image_key)
+                ).all()
+                counts: Dict[str, int] = {}
+                legacy = []
+                for digest, key in gone:
+                    if digest is None:
+                        legacy.append(key)
+                    else:
+                        counts[digest] = counts.get(digest, 0) + 1
+                if counts:
+                    v = values(column("sha256", String), column("n", Integer), name="released")
+                    v = v.data(list(counts.items()))
+                    s.execute(
+                        update(EvidenceBlob)
+                        .where(EvidenceBlob.sha256 == v.c.sha256)
+                        .values(refcount=func.greatest(EvidenceBlob.refcount - v.c.n, 0))
+                    )
+                s.commit()
+            rows += len(gone)
+
+            # pre-dedup objects belong to exactly one row
+            for key in legacy:
+                try:
+                    delete_object(key)
+                except Exception:
+                    log.exception("failed to delete evidence object %s", key)
+        return {"evidence_rows": rows, "blobs_deleted": self.sweep(shard)}
+
+    def sweep(self, shard: Shard, batch: int = 500) -> int:
+        deleted = 0
+        while True:
+            with shard.Session() as s:
+                rows = s.execute(
+                    select(EvidenceBlob.sha256, EvidenceBlob.object_key)
+                    .where(EvidenceBlob.refcount <= 0)
+                    .limit(batch)
+                    .with_for_update(skip_locked=True)
+                ).all()
+                if not rows:
+                    return deleted
+                done = []
+                for digest, key in rows:
+                    self._forget(key)
+                    try:
+                        delete_object(key)
+                    except Exception:
+                        log.exception("failed to delete evidence blob %s", key)
+                        continue
+                    done.append(digest)
+                if done:
+                    s.execute(delete(EvidenceBlob).where(EvidenceBlob.sha256.in_(done)))
+                s.commit()
+            deleted += len(done)
+            if len(done) < len(rows):
+                # failures stay for the next run instead of spinning on them
+                return deleted
+
+
+evidence_store = EvidenceStore()
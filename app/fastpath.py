@@ -0,0 +1,40 @@
+from typing import Iterable
+
+import orjson
+from fastapi import Response
+from sqlalchemy import null
+from sqlalchemy.engine import Row
+
+from db.models import Camera, Event, Guest, Site
+
+# Column projections matching the *Out schemas field-for-field (and in order)
+EVENT_COLUMNS = (
+    Event.id, Event.camera_id, Event.ts, Event.type, Event.person_name, Event.similarity,
+    Event.status, Event.decision, Event.handled_by_user_id, Event.handled_at, Event.notes,
+    # EventOut.evidence_url; filled in only with ?evidence_urls=true
+    null().label("evidence_url"),
+)
+CAMERA_COLUMNS = (
+    Camera.id, Camera.site_id, Camera.name, Camera.role, Camera.stream_url, Camera.enabled, Camera.created_at,
+    Camera.escalation_seconds,
+)
+SITE_COLUMNS = (Site.id, Site.org_id, Site.name, Site.created_at)
+GUEST_COLUMNS = (
+    Guest.id, Guest.site_id, Guest.name, Guest.contact, Guest.expires_at, Guest.folder_key, Guest.version,
+    Guest.created_at,
+)
+
+
+def rows_response(rows: Iterable[Row]) -> Response:
+    """
+    Encode Core rows straight to JSON bytes, skipping ORM entities and the
+    response_model re-validation. Routes keep their response_model, so the
+    OpenAPI schema is unchanged; returning a Response bypasses validation.
+    """
+    return Response(content=orjson.dumps([r._asdict() for r in rows]), media_type="application/json")
+
+
+def dicts_response(items: Iterable[dict]) -> Response:
+    # rows_response for rows that need extra fields attached first
+    return Response(content=orjson.dumps(list(items)), media_type="application/json")
+
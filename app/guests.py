@@ -0,0 +1,255 @@
+import asyncio
+import heapq
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from app.settings import settings
+from db.models import Guest, Site
+
+
+def to_naive_utc(ts: datetime) -> datetime:
+    # columns are naive UTC
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def _epoch(ts: datetime) -> float:
+    return ts.replace(tzinfo=timezone.utc).timestamp()
+
+
+def bump_guest_version(db: Session, site_id: int) -> int:
+    """Next guest version for the site. Row-locks the site until the caller commits."""
+    return db.execute(
+        update(Site)
+        .where(Site.id == site_id)
+        .values(guest_version=Site.guest_version + 1)
+        .returning(Site.guest_version)
+    ).scalar_one()
+
+
+class GuestMeta:
+    __slots__ = ("id", "site_id", "name", "contact", "expires_at", "folder_key", "version", "expires")
+
+    def __init__(self, g):
+        self.id = g.id
+        self.site_id = g.site_id
+        self.name = g.name
+        self.contact = g.contact
+        self.expires_at = g.expires_at
+        self.folder_key = g.folder_key
+        self.version = g.version
+        self.expires = _epoch(g.expires_at)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "contact": self.contact,
+            "expires_at": self.expires_at.isoformat(),
+            "folder_key": self.folder_key,
+            "version": self.version,
+        }
+
+
+class _SiteGuests:
+    __slots__ = ("version", "active", "tombstones")
+
+    def __init__(self):
+        self.version = 0
+        self.active: Dict[int, GuestMeta] = {}
+        # guest id -> (version, removed_at epoch) for deletions and expiries
+        self.tombstones: Dict[int, Tuple[int, float]] = {}
+
+
+_COLUMNS = (
+    Guest.id, Guest.site_id, Guest.name, Guest.contact, Guest.expires_at, Guest.folder_key,
+    Guest.version, Guest.deleted_at,
+)
+
+
+class GuestRegistry:
+    """
+    Per-site set of currently admitted guests, loaded lazily from the DB.
+
+    Every guest write bumps sites.guest_version and stamps the guest with it,
+    so a reader catches up on other workers' writes with one PK lookup and,
+    only when behind, a `version > known` query. Expiry is not a write: a
+    min-heap of expiry times moves guests out of the active set (sweep()),
+    leaving a tombstone with the removal time. Agents sync with a
+    "version:epoch" token and get guests written since `version` plus
+    removals with a newer version or a removal time after `epoch`.
+    """
+
+    def __init__(self, tombstone_seconds: float):
+        self.tombstone_seconds = tombstone_seconds
+        self._sites: Dict[int, _SiteGuests] = {}
+        # (expires epoch, site_id, guest_id, version); stale entries are skipped on pop
+        self._heap: List[Tuple[float, int, int, int]] = []
+        self._lock = threading.Lock()
+        self._pruned_at = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def _apply(self, sg: _SiteGuests, row, now: float):
+        # caller holds the lock; rows may be re-applied, this is idempotent
+        if row.deleted_at is not None:
+            sg.active.pop(row.id, None)
+            sg.tombstones[row.id] = (row.version, _epoch(row.deleted_at))
+            return
+        g = GuestMeta(row)
+        if g.expires <= now:
+            sg.active.pop(g.id, None)
+            sg.tombstones[g.id] = (g.version, g.expires)
+            return
+        sg.active[g.id] = g
+        sg.tombstones.pop(g.id, None)
+        heapq.heappush(self._heap, (g.expires, g.site_id, g.id, g.version))
+
+    def _load(self, db: Session, site_id: int) -> Optional[_SiteGuests]:
+        version = db.execute(select(Site.guest_version).where(Site.id == site_id)).scalar()
+        if version is None:
+            return None
+        floor = datetime.utcfromtimestamp(time.time() - self.tombstone_seconds)
+        rows = db.execute(
+            select(*_COLUMNS).where(
+                Guest.site_id == site_id,
+                # active, or removed recently enough that an agent may not know yet
+                or_(Guest.deleted_at > floor, (Guest.deleted_at.is_(None)) & (Guest.expires_at > floor)),
+            )
+        ).all()
+        sg = _SiteGuests()
+        now = time.time()
+        with self._lock:
+            for r in rows:
+                self._apply(sg, r, now)
+            sg.version = version
+            # another thread may have loaded it meanwhile; keep the first
+            return self._sites.setdefault(site_id, sg)
+
+    def refresh(self, db: Session, site_id: int) -> Optional[_SiteGuests]:
+        sg = self._sites.get(site_id)
+        if sg is None:
+            return self._load(db, site_id)
+        version = db.execute(select(Site.guest_version).where(Site.id == site_id)).scalar()
+        if version is None:
+            self._sites.pop(site_id, None)
+            return None
+        if version > sg.version:
+            known = sg.version
+            rows = db.execute(select(*_COLUMNS).where(Guest.site_id == site_id, Guest.version > known)).all()
+            now = time.time()
+            with self._lock:
+                for r in rows:
+                    self._apply(sg, r, now)
+                sg.version = max(sg.version, version)
+        return sg
+
+    def put(self, g: Guest):
+        """After a committed write in this process (a no-op for sites not loaded yet)."""
+        with self._lock:
+            sg = self._sites.get(g.site_id)
+            if sg is None:
+                return
+            self._apply(sg, g, time.time())
+            # only advance if nothing from another worker is in between;
+            # otherwise the next refresh() fetches the gap (and this row again)
+            if g.version == sg.version + 1:
+                sg.version = g.version
+
+    def sweep(self, now: float) -> Optional[float]:
+        """Expire due guests; returns the next expiry time, if any."""
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                expires, site_id, guest_id, version = heapq.heappop(self._heap)
+                sg = self._sites.get(site_id)
+                g = sg.active.get(guest_id) if sg else None
+                if g is None or g.version != version or g.expires != expires:
+                    continue
+                del sg.active[guest_id]
+                sg.tombstones[guest_id] = (version, expires)
+
+            if now - self._pruned_at >= 60:
+                floor = now - self.tombstone_seconds
+                for sg in self._sites.values():
+                    for gid in [gid for gid, (_, at) in sg.tombstones.items() if at < floor]:
+                        del sg.tombstones[gid]
+                self._pruned_at = now
+            return self._heap[0][0] if self._heap else None
+
+    def active(self, db: Session, site_id: int) -> List[Dict[str, Any]]:
+        sg = self.refresh(db, site_id)
+        if sg is None:
+            return []
+        self.sweep(time.time())
+        with self._lock:
+            guests = sorted(sg.active.values(), key=lambda g: g.expires)
+        return [g.as_dict() for g in guests]
+
+    def delta(self, db: Session, site_id: int, since: Optional[str]) -> Dict[str, Any]:
+        sg = self.refresh(db, site_id)
+        now = time.time()
+        self.sweep(now)
+        if sg is None:
+            return {"token": f"0:{int(now)}", "full": True, "upserts": [], "removed": []}
+
+        known = _parse_token(since)
+        with self._lock:
+            full = (
+                known is None
+                or known[0] > sg.version  # token from a different database / reset site
+                or known[1] < now - self.tombstone_seconds  # removals may have been pruned
+            )
+            if full:
+                upserts = list(sg.active.values())
+                removed: List[int] = []
+            else:
+                v, t = known
+                upserts = [g for g in sg.active.values() if g.version > v]
+                removed = [gid for gid, (ver, at) in sg.tombstones.items() if ver > v or at > t]
+            token = f"{sg.version}:{int(now)}"
+
+        return {
+            "token": token,
+            "full": full,
+            "upserts": [g.as_dict() for g in sorted(upserts, key=lambda g: g.id)],
+            "removed": sorted(removed),
+        }
+
+    async def _run(self):
+        while True:
+            now = time.time()
+            nxt = self.sweep(now)
+            delay = settings.GUEST_SWEEP_SECONDS if nxt is None else min(max(nxt - now, 0.05), settings.GUEST_SWEEP_SECONDS)
+            await asyncio.sleep(delay)
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+def _parse_token(token: Optional[str]) -> Optional[Tuple[int, float]]:
+    if not token:
+        return None
+    try:
+        v, t = token.split(":", 1)
+        return int(v), float(t)
+    except ValueError:
+        return None
+
+
+guest_registry = GuestRegistry(settings.GUEST_TOMBSTONE_SECONDS)
@@ -0,0 +1,193 @@
+import logging
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.embeddings import LiveView, embedding_store
+from app.settings import settings
+
+log = logging.getLogger(__name__)
+
+_KIND_NAMES = {0: "guest", 1: "resident"}
+
+
+def _nlist(n: int) -> int:
+    """IVF cluster count for a gallery of n rows; 0 = exact search only."""
+    return int(np.sqrt(n)) if n >= settings.IDENTIFY_IVF_MIN_ROWS else 0
+
+
+def _normalize(x: np.ndarray) -> np.ndarray:
+    x = np.asarray(x, dtype=np.float32)
+    norms = np.linalg.norm(x, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+def spherical_kmeans(x: np.ndarray, nlist: int, iters: int = 10, seed: int = 0, sample: int = 50_000) -> np.ndarray:
+    """Centroids (nlist x d, unit length) for normalized rows x, trained on a sample."""
+    rnd = np.random.default_rng(seed)
+    train = x[rnd.choice(len(x), size=min(sample, len(x)), replace=False)]
+    cent = train[rnd.choice(len(train), size=nlist, replace=False)].copy()
+    for _ in range(iters):
+        assign = _assign(train, cent)
+        sums = np.zeros_like(cent)
+        np.add.at(sums, assign, train)
+        counts = np.bincount(assign, minlength=nlist)
+        empty = counts == 0
+        # re-seed empty clusters from random training rows
+        sums[empty] = train[rnd.choice(len(train), size=int(empty.sum()))]
+        cent = _normalize(sums)
+    return cent
+
+
+def _assign(x: np.ndarray, cent: np.ndarray, chunk: int = 16_384) -> np.ndarray:
+    out = np.empty(len(x), dtype=np.int64)
+    for i in range(0, len(x), chunk):
+        out[i:i + chunk] = np.argmax(x[i:i + chunk] @ cent.T, axis=1)
+    return out
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Column indices of the k largest per row, best first."""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1)
+    return np.take_along_axis(part, order, axis=1)
+
+
+class SiteIndex:
+    """
+    Normalized float32 copy of a site's live embeddings, so cosine similarity
+    is one matrix product. Large galleries also get an IVF index: k-means
+    centroids plus the rows of each cluster, and a query only scores the rows
+    of its `nprobe` nearest clusters.
+    """
+
+    def __init__(self, version: int, ref: np.ndarray, kind: np.ndarray, label: np.ndarray, matrix: np.ndarray,
+                 nlist: int = 0):
+        self.version = version
+        self.ref = ref
+        self.kind = kind
+        self.label = label
+        self.matrix = _normalize(matrix)
+        self.centroids: Optional[np.ndarray] = None
+        if nlist and len(self.matrix) >= nlist * 4:
+            self.centroids = spherical_kmeans(self.matrix, nlist)
+            assign = _assign(self.matrix, self.centroids)
+            # rows grouped by cluster; cluster c is order[offsets[c]:offsets[c + 1]]
+            self.order = np.argsort(assign, kind="stable")
+            self.offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=nlist))))
+
+    @classmethod
+    def from_live(cls, lv: LiveView, ivf: bool = True) -> "SiteIndex":
+        return cls(lv.version, lv.ref, lv.kind, lv.label, lv.matrix, _nlist(len(lv.ref)) if ivf else 0)
+
+    def search(self, queries: np.ndarray, k: int, nprobe: Optional[int] = None, exact: bool = False):
+        """
+        (indices, scores), each q x min(k, gallery size); rows of the gallery,
+        best first. An IVF query whose probed clusters hold fewer than that
+        many rows is padded with index -1 and score -inf.
+        """
+        q = _normalize(queries)
+        if len(self.matrix) == 0:
+            return np.empty((len(q), 0), dtype=np.int64), np.empty((len(q), 0), dtype=np.float32)
+        if self.centroids is None or exact:
+            scores = q @ self.matrix.T
+            idx = _top_k(scores, k)
+            return idx, np.take_along_axis(scores, idx, axis=1)
+
+        nprobe = min(nprobe or settings.IDENTIFY_IVF_NPROBE, len(self.centroids))
+        probes = _top_k(q @ self.centroids.T, nprobe)
+        width = min(k, len(self.matrix))
+        idx = np.full((len(q), width), -1, dtype=np.int64)
+        scores = np.full((len(q), width), -np.inf, dtype=np.float32)
+        for qi, clusters in enumerate(probes):
+            cand = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in clusters])
+            s = self.matrix[cand] @ q[qi]
+            top = _top_k(s[None, :], k)[0]
+            idx[qi, :len(top)] = cand[top]
+            scores[qi, :len(top)] = s[top]
+        return idx, scores
+
+
+class IdentifyCache:
+    """
+    One SiteIndex per site, rebuilt when the site's embedding version moves.
+    The request that notices a new version builds an exact-only index (one
+    normalization pass) and answers from it; for large sites the IVF index is
+    trained by a background thread per site and swapped in when it is done.
+    """
+
+    def __init__(self):
+        self._indexes: Dict[int, SiteIndex] = {}
+        self._locks: Dict[int, threading.Lock] = {}
+        self._building: set = set()
+        self._guard = threading.Lock()
+
+    def index(self, site_id: int) -> SiteIndex:
+        lv = embedding_store.site(site_id).live()
+        idx = self._indexes.get(site_id)
+        if idx is not None and idx.version == lv.version:
+            return idx
+        with self._guard:
+            lock = self._locks.setdefault(site_id, threading.Lock())
+        with lock:
+            # another request may have rebuilt it while we waited
+            idx = self._indexes.get(site_id)
+            if idx is None or idx.version != lv.version:
+                idx = self._indexes[site_id] = SiteIndex.from_live(lv, ivf=False)
+                if _nlist(len(lv.ref)):
+                    self._train_later(site_id)
+        return idx
+
+    def _train_later(self, site_id: int):
+        with self._guard:
+            if site_id in self._building:
+                # the running build re-checks the version before it exits
+                return
+            self._building.add(site_id)
+        threading.Thread(target=self._train, args=(site_id,), name=f"ivf-{site_id}", daemon=True).start()
+
+    def _train(self, site_id: int):
+        site = embedding_store.site(site_id)
+        try:
+            while True:
+                idx = SiteIndex.from_live(site.live())
+                with self._guard:
+                    cur = self._indexes.get(site_id)
+                    if cur is None or cur.version <= idx.version:
+                        self._indexes[site_id] = idx
+                    if site.live().version == idx.version:
+                        self._building.discard(site_id)
+                        return
+        except Exception:
+            log.exception("IVF build for site %s failed", site_id)
+            with self._guard:
+                self._building.discard(site_id)
+
+    def identify(self, site_id: int, vectors: List[List[float]], k: int, min_similarity: Optional[float],
+                 exact: bool) -> Tuple[int, List[List[Dict[str, Any]]]]:
+        idx = self.index(site_id)
+        queries = np.asarray(vectors, dtype=np.float32)
+        if queries.ndim != 2 or queries.shape[1] != idx.matrix.shape[1]:
+            raise ValueError(f"expected vectors of {idx.matrix.shape[1]} floats")
+        rows, scores = idx.search(queries, k, exact=exact)
+        out = []
+        for r, s in zip(rows, scores):
+            out.append([
+                {
+                    "ref": int(idx.ref[i]),
+                    "kind": _KIND_NAMES[int(idx.kind[i])],
+                    "label": idx.label[i].decode(errors="replace"),
+                    "similarity": round(float(sc), 4),
+                }
+                for i, sc in zip(r, s)
+                if i >= 0 and (min_similarity is None or sc >= min_similarity)
+            ])
+        return idx.version, out
+
+
+identify_cache = IdentifyCache()
@@ -0,0 +1,143 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+
+from app.settings import settings
+from app.shards import Shard
+from db.models import Event
+
+
+class IngestOverloaded(Exception):
+    pass
+
+
+_STOP = object()
+
+
+class IngestQueue:
+    """
+    Write-behind buffer for agent events (group commit).
+
+    Callers enqueue a validated row and await its id. A single flusher task
+    drains the queue and commits up to `max_batch` rows per transaction with
+    one multi-row INSERT, flushing early once `flush_ms` has passed since the
+    first row of the group arrived.
+    """
+
+    def __init__(self, max_batch: int, flush_ms: int, max_pending: int, enqueue_timeout_ms: int):
+        self.max_batch = max_batch
+        self.flush_ms = flush_ms
+        self.enqueue_timeout_ms = enqueue_timeout_ms
+        self._max_pending = max_pending
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._closing
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._closing = False
+        self._queue = asyncio.Queue(maxsize=self._max_pending)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        # Reject new rows, then let the flusher drain everything queued before the sentinel
+        self._closing = True
+        await self._queue.put((_STOP, None))
+        await self._task
+        # submitters that were blocked on a full queue can land behind the sentinel
+        while not self._queue.empty():
+            item, fut = self._queue.get_nowait()
+            if item is not _STOP and not fut.done():
+                fut.set_exception(IngestOverloaded("ingest queue stopped"))
+        self._task = None
+        self._queue = None
+
+    async def submit(self, row: Dict[str, Any], shard: Shard) -> int:
+        if not self.running:
+            raise IngestOverloaded("ingest queue not running")
+
+        fut = asyncio.get_running_loop().create_future()
+        task = self._task
+        try:
+            # Backpressure: wait for room, but not forever
+            await asyncio.wait_for(self._queue.put(((shard, row), fut)), timeout=self.enqueue_timeout_ms / 1000)
+        except asyncio.TimeoutError:
+            raise IngestOverloaded("ingest queue full")
+        if self._closing and task.done() and not fut.done():
+            # landed after the flusher exited and after stop() drained the queue
+            fut.set_exception(IngestOverloaded("ingest queue stopped"))
+
+        # Resolves once the group containing this row is committed
+        return await fut
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item, fut = await self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [(item, fut)]
+            deadline = loop.time() + self.flush_ms / 1000
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item, fut = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append((item, fut))
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Tuple[Tuple[Shard, Dict[str, Any]], asyncio.Future]]):
+        # one transaction per event shard touched by this group
+        groups: Dict[int, List[Tuple[Shard, Dict[str, Any], asyncio.Future]]] = {}
+        for (shard, row), fut in batch:
+            groups.setdefault(shard.index, []).append((shard, row, fut))
+
+        for items in groups.values():
+            try:
+                ids = await _insert_events(items[0][0], [row for _, row, _ in items])
+            except Exception as e:
+                for _, _, fut in items:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+
+            for (_, _, fut), ev_id in zip(items, ids):
+                if not fut.done():
+                    fut.set_result(ev_id)
+
+
+async def _insert_events(shard: Shard, rows: List[Dict[str, Any]]) -> List[int]:
+    async with shard.AsyncSession() as db:
+        ids = (
+            await db.scalars(
+                insert(Event).returning(Event.id, sort_by_parameter_order=True),
+                rows,
+            )
+        ).all()
+        await db.commit()
+    return list(ids)
+
+
+ingest_queue = IngestQueue(
+    max_batch=settings.INGEST_BATCH_MAX,
+    flush_ms=settings.INGEST_FLUSH_MS,
+    max_pending=settings.INGEST_QUEUE_MAX,
+    enqueue_timeout_ms=settings.INGEST_ENQUEUE_TIMEOUT_MS,
+)
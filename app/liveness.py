@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import column, func, select, update, values, BigInteger, DateTime
+
+from app.db import SessionLocal
+from app.realtime import broadcaster
+from app.settings import settings
+from db.models import Agent
+
+log = logging.getLogger(__name__)
+
+
+class AgentLiveness:
+    """
+    Last time each agent was heard from, recorded in memory on every
+    authenticated agent call and written to agents.last_seen in one UPDATE
+    every AGENT_SEEN_FLUSH_SECONDS.
+
+    Offline detection uses a hashed timer wheel of AGENT_WHEEL_TICK_SECONDS
+    slots. Recording an agent only moves its deadline; when the wheel reaches
+    a slot, agents whose deadline moved are re-slotted and the rest are
+    checked against agents.last_seen by primary key (another worker may have
+    served them) before agent_offline goes out. An agent seen again after
+    that gets agent_online. State is per process, like the broadcaster.
+    """
+
+    def __init__(self):
+        # agent_id -> last seen (naive UTC) not yet written
+        self._pending: Dict[int, datetime] = {}
+        # agent_id -> monotonic deadline
+        self._deadline: Dict[int, float] = {}
+        self._site: Dict[int, int] = {}
+        self._offline: Set[int] = set()
+        self._slots: List[Set[int]] = []
+        self._tick = 0
+        self._tasks: List[asyncio.Task] = []
+
+    # ----- hot path -----
+
+    async def seen(self, agent_id: int, site_id: int):
+        now = time.monotonic()
+        self._pending[agent_id] = datetime.utcnow()
+        new = agent_id not in self._deadline
+        self._deadline[agent_id] = now + settings.AGENT_OFFLINE_SECONDS
+        if new:
+            self._site[agent_id] = site_id
+            self._schedule(agent_id, now + settings.AGENT_OFFLINE_SECONDS)
+        if agent_id in self._offline:
+            self._offline.discard(agent_id)
+            await broadcaster.broadcast({"type": "agent_online", "agent_id": agent_id, "site_id": site_id})
+
+    # ----- timer wheel -----
+
+    def _ticks(self, seconds: float) -> int:
+        return max(1, math.ceil(seconds / settings.AGENT_WHEEL_TICK_SECONDS))
+
+    def _schedule(self, agent_id: int, deadline: float):
+        if not self._slots:
+            self._slots = [set() for _ in range(self._ticks(settings.AGENT_OFFLINE_SECONDS) + 1)]
+        ahead = min(self._ticks(deadline - time.monotonic()), len(self._slots) - 1)
+        self._slots[(self._tick + ahead) % len(self._slots)].add(agent_id)
+
+    def _advance(self) -> List[int]:
+        """Move the wheel one slot; agents whose deadline really passed."""
+        if not self._slots:
+            return []
+        self._tick += 1
+        slot = self._slots[self._tick % len(self._slots)]
+        self._slots[self._tick % len(self._slots)] = set()
+        now = time.monotonic()
+        expired = []
+        for aid in slot:
+            deadline = self._deadline.get(aid)
+            if deadline is None:
+                continue
+            if deadline > now:
+                self._schedule(aid, deadline)
+            else:
+                expired.append(aid)
+        return expired
+
+    def _confirm(self, agent_ids: List[int]) -> Dict[int, Optional[datetime]]:
+        with SessionLocal() as db:
+            return dict(db.execute(select(Agent.id, Agent.last_seen).where(Agent.id.in_(agent_ids))).all())
+
+    async def _detect(self):
+        while True:
+            await asyncio.sleep(settings.AGENT_WHEEL_TICK_SECONDS)
+            expired = self._advance()
+            if not expired:
+                continue
+            try:
+                last_seen = await asyncio.to_thread(self._confirm, expired)
+            except Exception:
+                log.exception("agent liveness check failed")
+                last_seen = {}
+            cutoff = datetime.utcnow() - timedelta(seconds=settings.AGENT_OFFLINE_SECONDS)
+            for aid in expired:
+                if aid not in self._deadline:
+                    continue
+                ts = last_seen.get(aid)
+                if ts is not None and ts > cutoff:
+                    # heard from elsewhere: check again when that runs out
+                    left = (ts - cutoff).total_seconds()
+                    self._deadline[aid] = time.monotonic() + left
+                    self._schedule(aid, self._deadline[aid])
+                    continue
+                # stays out of the wheel until seen() puts it back
+                del self._deadline[aid]
+                self._offline.add(aid)
+                await broadcaster.broadcast({
+                    "type": "agent_offline",
+                    "agent_id": aid,
+                    "site_id": self._site.get(aid),
+                    "last_seen": ts.isoformat() if ts else None,
+                })
+
+    # ----- persistence -----
+
+    def _write(self, pending: Dict[int, datetime]):
+        v = values(column("id", BigInteger), column("ts", DateTime), name="seen").data(list(pending.items()))
+        with SessionLocal() as db:
+            db.execute(
+                update(Agent)
+                .where(Agent.id == v.c.id)
+                # workers flush independently; never move last_seen backwards
+                .values(last_seen=func.greatest(Agent.last_seen, v.c.ts))
+            )
+            db.commit()
+
+    async def flush(self):
+        # swapped on the loop, so no seen() lands in a map that is being written
+        pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        try:
+            await asyncio.to_thread(self._write, pending)
+        except Exception:
+            # keep them for the next round unless seen again meanwhile
+            for aid, entry in pending.items():
+                self._pending.setdefault(aid, entry)
+            raise
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(settings.AGENT_SEEN_FLUSH_SECONDS)
+            try:
+                await self.flush()
+            except Exception:
+                log.exception("agent last_seen flush failed")
+
+    async def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._flush_loop()), asyncio.create_task(self._detect())]
+
+    async def stop(self):
+        for t in self._tasks:
+            t.cancel()
+        for t in self._tasks:
+            try:
+                await t
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        await self.flush()
+
+
+agent_liveness = AgentLiveness()
@@ -0,0 +1,218 @@
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.db import pool_stats
+
+# Per metric; label sets beyond this collapse into "other" so a flood of new
+# agents/routes can't grow memory or scrape size without bound
+MAX_SERIES = 500
+_OTHER = "other"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, store: dict, values: Sequence) -> Tuple[str, ...]:
+        key = tuple(str(v) for v in values)
+        if key not in store and len(store) >= MAX_SERIES:
+            return tuple(_OTHER for _ in self.labels)
+        return key
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels, value: float = 1.0):
+        with self._lock:
+            key = self._key(self._values, labels)
+            self._values[key] = self._values.get(key, 0.0) + value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_fmt_labels(self.labels, k)} {v}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, *labels, value: float):
+        with self._lock:
+            self._values[self._key(self._values, labels)] = value
+
+    def dec(self, *labels, value: float = 1.0):
+        self.inc(*labels, value=-value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+        # label values -> [per-bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, *labels, value: float):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            key = self._key(self._series, labels)
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            s[0][i] += 1
+            s[1][0] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(c), t[0]) for k, (c, t) in self._series.items()]
+        out = self.header()
+        for key, counts, total in items:
+            acc = 0
+            for b, c in zip(self.buckets, counts):
+                acc += c
+                le = 'le="%s"' % b
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labels, key, le)} {acc}")
+            acc += counts[-1]
+            le = 'le="+Inf"'
+            out.append(f"{self.name}_bucket{_fmt_labels(self.labels, key, le)} {acc}")
+            out.append(f"{self.name}_sum{_fmt_labels(self.labels, key)} {total}")
+            out.append(f"{self.name}_count{_fmt_labels(self.labels, key)} {acc}")
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[str]]] = []
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        m = Counter(name, help, labels)
+        self._metrics.append(m)
+        return m
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        m = Gauge(name, help, labels)
+        self._metrics.append(m)
+        return m
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        m = Histogram(name, help, labels, buckets)
+        self._metrics.append(m)
+        return m
+
+    def collector(self, fn: Callable[[], Iterable[str]]):
+        """Values computed at scrape time (e.g. pool gauges), not on the hot path."""
+        self._collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for m in self._metrics:
+            lines.extend(m.render())
+        for fn in self._collectors:
+            lines.extend(fn())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_latency = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status")
+)
+db_queries = registry.counter("db_queries_total", "SQL statements executed", ("op",))
+db_query_latency = registry.histogram("db_query_duration_seconds", "SQL statement latency", ("op",))
+ingest_events = registry.counter("ingest_events_total", "Events accepted from agents", ("site", "agent", "path"))
+ingest_rejected = registry.counter("ingest_rejected_total", "Ingest requests shed by admission control", ("reason",))
+evidence_upload_latency = registry.histogram("evidence_upload_seconds", "Evidence upload latency")
+evidence_upload_failures = registry.counter("evidence_upload_failures_total", "Evidence uploads that raised")
+ws_connections = registry.gauge("ws_connections", "Open realtime WebSocket connections")
+ws_fanout_latency = registry.histogram("ws_fanout_seconds", "Time to deliver one message to all WebSocket clients")
+ws_messages = registry.counter("ws_messages_total", "Realtime messages delivered", ("type",))
+
+
+@registry.collector
+def _pool_gauges() -> List[str]:
+    names = {
+        "db_pool_checked_out": ("gauge", "checked_out", "Connections currently checked out"),
+        "db_pool_overflow": ("gauge", "overflow", "Connections open beyond pool_size"),
+        "db_pool_size": ("gauge", "size", "Configured pool size"),
+        "db_pool_checkouts_total": ("counter", "checkouts", "Pool checkouts"),
+        "db_pool_timeouts_total": ("counter", "timeouts", "Checkouts that hit pool_timeout"),
+        "db_pool_wait_max_ms": ("gauge", "wait_max_ms", "Longest checkout wait"),
+        "db_pool_wait_avg_ms": ("gauge", "wait_avg_ms", "Mean checkout wait"),
+    }
+    snaps = {name: st.snapshot() for name, st in pool_stats.items()}
+    out: List[str] = []
+    for metric, (kind, field, help) in names.items():
+        out += [f"# HELP {metric} {help}", f"# TYPE {metric} {kind}"]
+        out += [f'{metric}{{pool="{pool}"}} {snap[field]}' for pool, snap in snaps.items()]
+    return out
+
+
+def _statement_op(statement: str) -> str:
+    word = statement.lstrip().split(None, 1)
+    op = word[0].upper() if word else ""
+    return op if op in ("SELECT", "INSERT", "UPDATE", "DELETE", "COPY", "WITH") else "OTHER"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_metrics_t0", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stack = conn.info.get("_metrics_t0")
+    if not stack:
+        return
+    elapsed = time.perf_counter() - stack.pop()
+    op = _statement_op(statement)
+    db_queries.inc(op)
+    db_query_latency.observe(op, value=elapsed)
+
+
+async def track_http(request: Request, call_next):
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # route template, not the raw path, keeps label cardinality bounded
+        route = request.scope.get("route")
+        path: Optional[str] = getattr(route, "path", None) or "unmatched"
+        http_latency.observe(request.method, path, f"{status // 100}xx", value=time.perf_counter() - t0)
@@ -1,2 +1,2 @@
 # Reuse Phase 1 models
-from db.models import Organization, Site, User, Agent, Camera, Event, Evidence, Guest  # noqa: F401
\ No newline at end of file
+from db.models import Organization, Site, User, Agent, Camera, Event, Evidence, Guest, BackfillWatermark, SiteOccupancy, EvidenceBlob  # noqa: F401
\ No newline at end of file
@@ -0,0 +1,274 @@
+import asyncio
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.camera_registry import camera_registry
+from app.db import SessionLocal
+from app.realtime import broadcaster
+from app.settings import settings
+from app.shards import shard_router
+from db.models import Event, SiteOccupancy
+
+log = logging.getLogger(__name__)
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+class _SiteState:
+    __slots__ = ("site_id", "present", "anonymous", "watermark", "applied", "pending")
+
+    def __init__(self, site_id: int):
+        self.site_id = site_id
+        # person_name -> entered at
+        self.present: Dict[str, datetime] = {}
+        self.anonymous = 0
+        # events created before the watermark are reflected; after it, exactly the ids in applied
+        self.watermark = _EPOCH
+        self.applied: Set[int] = set()
+        # applied here from the live path and not yet seen by a sync: (id, role, person_name, ts)
+        self.pending: List[Tuple[int, str, Optional[str], datetime]] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.present) + self.anonymous
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self.pending)
+
+    def apply(self, role: str, person_name: Optional[str], ts: datetime) -> Optional[Dict[str, Any]]:
+        """Apply one entry/exit; returns what changed, or None."""
+        change: Optional[Dict[str, Any]] = None
+        if role == "entry":
+            if person_name:
+                if person_name not in self.present:
+                    self.present[person_name] = ts
+                    change = {"entered": person_name}
+            else:
+                self.anonymous += 1
+                change = {"entered": None}
+        elif role == "exit":
+            if person_name and person_name in self.present:
+                del self.present[person_name]
+                change = {"left": person_name}
+            elif self.anonymous > 0:
+                # unrecognised on exit, or recognised but came in unrecognised
+                self.anonymous -= 1
+                change = {"left": None}
+        return change
+
+    def as_dict(self, names: bool = True) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"site_id": self.site_id, "count": self.count, "anonymous": self.anonymous}
+        if names:
+            out["present"] = [
+                {"person_name": n, "since": ts.isoformat()}
+                for n, ts in sorted(self.present.items(), key=lambda kv: kv[1])
+            ]
+        return out
+
+
+class OccupancyTracker:
+    """
+    Who is inside each site, maintained from entry/exit camera events: named
+    people plus an anonymous counter.
+
+    site_occupancy is the shared state. A sync locks a site's row, applies
+    every committed event created since the row's watermark that is not in
+    its applied ids, moves the watermark to OCCUPANCY_COMMIT_SECONDS before
+    the shard's clock and writes the row back. Every event is folded in once,
+    by whichever worker syncs first, however ids and commits interleave.
+
+    Each process keeps a copy, updated on the live path right away (for the
+    occupancy_changed broadcast) and replaced by the synced row every
+    OCCUPANCY_FLUSH_SECONDS for sites that had events here. Live events the
+    sync has not seen yet are applied again on top. Loading a site is a sync,
+    so a restart loses nothing. A site without a row yet is seeded the way
+    POST /occupancy/{site}/rebuild recomputes one (e.g. after a backfill):
+    from the last OCCUPANCY_REBUILD_DAYS of events.
+    """
+
+    def __init__(self):
+        self._sites: Dict[int, _SiteState] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    # ----- shared state -----
+
+    def _locked_snapshot(self, db, site_id: int) -> Tuple[SiteOccupancy, bool]:
+        """The site's row, locked for this transaction, and whether it was just created."""
+        created = db.execute(
+            pg_insert(SiteOccupancy).values(site_id=site_id).on_conflict_do_nothing()
+            .returning(SiteOccupancy.site_id)
+        ).first() is not None
+        snap = db.execute(
+            select(SiteOccupancy).where(SiteOccupancy.site_id == site_id).with_for_update()
+        ).scalar_one()
+        return snap, created
+
+    def _replay_history(self, sdb, st: _SiteState, roles: Dict[int, str], days: int) -> Set[int]:
+        """Recompute st from the last `days` of events; returns the ids it saw."""
+        since = datetime.utcnow() - timedelta(days=days)
+        seen: Set[int] = set()
+        st.watermark = sdb.scalar(select(func.localtimestamp())) - timedelta(seconds=settings.OCCUPANCY_COMMIT_SECONDS)
+        if not roles:
+            return seen
+        # recent inserts with an older capture time too, or the next sync would apply them late
+        rows = sdb.execute(
+            select(Event.id, Event.camera_id, Event.ts, Event.person_name, Event.created_at)
+            .where(
+                Event.camera_id.in_(list(roles)),
+                or_(Event.ts >= since, Event.created_at >= st.watermark),
+            )
+            .order_by(Event.ts.asc(), Event.id.asc())
+        ).yield_per(5000)
+        for e in rows:
+            seen.add(e.id)
+            st.apply(roles[e.camera_id], e.person_name, e.ts)
+            if e.created_at >= st.watermark:
+                st.applied.add(e.id)
+        return seen
+
+    def _save(self, snap: SiteOccupancy, st: _SiteState):
+        snap.present_json = json.dumps({n: ts.isoformat() for n, ts in st.present.items()})
+        snap.anonymous = st.anonymous
+        snap.watermark = st.watermark
+        snap.applied_json = json.dumps(sorted(st.applied))
+        snap.updated_at = datetime.utcnow()
+
+    def _install(self, st: _SiteState, seen: Set[int]):
+        """Make a synced state this process's copy, keeping live events the sync did not see."""
+        with self._lock:
+            old = self._sites.get(st.site_id)
+            if old is not None:
+                for p in old.pending:
+                    if p[0] not in seen and p[0] not in st.applied:
+                        st.apply(*p[1:])
+                        st.applied.add(p[0])
+                        st.pending.append(p)
+            self._sites[st.site_id] = st
+
+    def sync(self, site_id: int) -> _SiteState:
+        st = _SiteState(site_id)
+        with SessionLocal() as db:
+            roles = {c.id: c.role for c in camera_registry.site_cameras(db, site_id)}
+            snap, created = self._locked_snapshot(db, site_id)
+            with shard_router.for_site(site_id).Session() as sdb:
+                if created:
+                    # no snapshot yet: seed from recent history like rebuild(), not the whole table
+                    seen = self._replay_history(sdb, st, roles, settings.OCCUPANCY_REBUILD_DAYS)
+                else:
+                    seen = self._catch_up(sdb, snap, st, roles)
+            self._save(snap, st)
+            db.commit()
+        self._install(st, seen)
+        return st
+
+    def _catch_up(self, sdb, snap: SiteOccupancy, st: _SiteState, roles: Dict[int, str]) -> Set[int]:
+        """Load the snapshot into st and apply events created since its watermark; returns the ids it saw."""
+        st.present = {n: datetime.fromisoformat(ts) for n, ts in json.loads(snap.present_json).items()}
+        st.anonymous = snap.anonymous
+        done = set(json.loads(snap.applied_json))
+        seen: Set[int] = set()
+        watermark = sdb.scalar(select(func.localtimestamp())) - timedelta(seconds=settings.OCCUPANCY_COMMIT_SECONDS)
+        watermark = max(watermark, snap.watermark)
+        if roles:
+            rows = sdb.execute(
+                select(Event.id, Event.camera_id, Event.ts, Event.person_name, Event.created_at)
+                .where(Event.camera_id.in_(list(roles)), Event.created_at >= snap.watermark)
+                .order_by(Event.created_at.asc(), Event.id.asc())
+            ).yield_per(5000)
+            for e in rows:
+                seen.add(e.id)
+                if e.id not in done:
+                    st.apply(roles[e.camera_id], e.person_name, e.ts)
+                if e.created_at >= watermark:
+                    st.applied.add(e.id)
+        st.watermark = watermark
+        return seen
+
+    def get(self, site_id: int) -> _SiteState:
+        st = self._sites.get(site_id)
+        return st if st is not None else self.sync(site_id)
+
+    def rebuild(self, site_id: int, days: int) -> Dict[str, Any]:
+        st = _SiteState(site_id)
+        with SessionLocal() as db:
+            roles = {c.id: c.role for c in camera_registry.site_cameras(db, site_id)}
+            snap, _ = self._locked_snapshot(db, site_id)
+            with shard_router.for_site(site_id).Session() as sdb:
+                seen = self._replay_history(sdb, st, roles, days)
+            self._save(snap, st)
+            db.commit()
+        self._install(st, seen)
+        return st.as_dict(names=False)
+
+    # ----- live path -----
+
+    async def record(self, site_id: int, role: str, ev: Event):
+        """Called after the event committed, so it must not fail the ingest."""
+        if site_id not in self._sites:
+            try:
+                await run_in_threadpool(self.sync, site_id)
+            except Exception:
+                # the row is committed; whichever sync loads the site next folds it in
+                log.exception("occupancy load for site %s failed", site_id)
+                return
+        with self._lock:
+            st = self._sites[site_id]
+            if ev.id in st.applied:
+                # already folded in by the sync that loaded the site
+                return
+            change = st.apply(role, ev.person_name, ev.ts)
+            st.applied.add(ev.id)
+            st.pending.append((ev.id, role, ev.person_name, ev.ts))
+            count, anonymous = st.count, st.anonymous
+        if change is None:
+            return
+        await broadcaster.broadcast(
+            {"type": "occupancy_changed", "site_id": site_id, "count": count, "anonymous": anonymous, **change}
+        )
+
+    # ----- persistence -----
+
+    def flush(self):
+        with self._lock:
+            dirty = [st.site_id for st in self._sites.values() if st.dirty]
+        for site_id in dirty:
+            try:
+                self.sync(site_id)
+            except Exception:
+                # still dirty; tried again next round
+                log.exception("occupancy sync for site %s failed", site_id)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.OCCUPANCY_FLUSH_SECONDS)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception:
+                log.exception("occupancy snapshot failed")
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await asyncio.to_thread(self.flush)
+
+
+occupancy = OccupancyTracker()
@@ -0,0 +1,159 @@
+import math
+import time
+from typing import Any, Dict, Optional
+
+from fastapi import Depends, HTTPException
+
+from app.agent_auth import get_current_agent
+from app.metrics import ingest_rejected
+from app.settings import settings
+from db.models import Agent
+
+
+class TokenBucket:
+    __slots__ = ("rate", "burst", "tokens", "updated", "allowed", "rejected")
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.allowed = 0
+        self.rejected = 0
+
+    def reconfigure(self, rate: float, burst: int):
+        if rate != self.rate or burst != self.burst:
+            self.rate = rate
+            self.burst = burst
+            self.tokens = min(self.tokens, float(burst))
+
+    def _refill(self, now: float):
+        self.tokens = min(float(self.burst), self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until one token is available (0 = available now). Does not consume."""
+        self._refill(now)
+        if self.tokens >= 1.0:
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1.0
+        self.allowed += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "rate_per_sec": self.rate,
+            "burst": self.burst,
+            "tokens": round(self.tokens, 2),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+        }
+
+
+class RateLimiter:
+    """
+    In-memory per-agent and per-site token buckets for the ingest routes.
+    A request must find a token in both buckets; nothing is consumed on reject.
+    Only touched from the event loop, so no locking.
+    """
+
+    def __init__(self):
+        self._agents: Dict[int, TokenBucket] = {}
+        self._sites: Dict[int, TokenBucket] = {}
+
+    def _agent_bucket(self, ag: Agent) -> Optional[TokenBucket]:
+        rate = ag.rate_limit_per_sec if ag.rate_limit_per_sec is not None else settings.INGEST_AGENT_RATE_PER_SEC
+        burst = ag.rate_limit_burst if ag.rate_limit_burst is not None else settings.INGEST_AGENT_BURST
+        return self._bucket(self._agents, ag.id, rate, burst)
+
+    def _site_bucket(self, site_id: int) -> Optional[TokenBucket]:
+        return self._bucket(self._sites, site_id, settings.INGEST_SITE_RATE_PER_SEC, settings.INGEST_SITE_BURST)
+
+    @staticmethod
+    def _bucket(buckets: Dict[int, TokenBucket], key: int, rate: float, burst: int) -> Optional[TokenBucket]:
+        if rate <= 0:
+            buckets.pop(key, None)
+            return None
+        burst = max(1, burst)
+        b = buckets.get(key)
+        if b is None:
+            b = buckets[key] = TokenBucket(rate, burst)
+        else:
+            b.reconfigure(rate, burst)
+        return b
+
+    def admit(self, ag: Agent) -> float:
+        """Returns 0 if admitted, else the number of seconds to wait."""
+        now = time.monotonic()
+        buckets = [b for b in (self._agent_bucket(ag), self._site_bucket(ag.site_id)) if b is not None]
+
+        wait = 0.0
+        for b in buckets:
+            w = b.wait_time(now)
+            if w > 0:
+                b.rejected += 1
+                wait = max(wait, w)
+        if wait > 0:
+            return wait
+
+        for b in buckets:
+            b.consume()
+        return 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "agents": {str(k): b.snapshot() for k, b in self._agents.items()},
+            "sites": {str(k): b.snapshot() for k, b in self._sites.items()},
+        }
+
+
+class ConcurrencyLimit:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self.rejected = 0
+
+    def try_acquire(self) -> bool:
+        if self.limit > 0 and self.in_flight >= self.limit:
+            self.rejected += 1
+            return False
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"limit": self.limit, "in_flight": self.in_flight, "rejected": self.rejected}
+
+
+rate_limiter = RateLimiter()
+ingest_concurrency = ConcurrencyLimit(settings.INGEST_MAX_CONCURRENCY)
+
+
+def _too_many(detail: str, retry_after: float) -> HTTPException:
+    return HTTPException(429, detail, headers={"Retry-After": str(max(1, math.ceil(retry_after)))})
+
+
+async def ingest_slot():
+    # Shed before auth/DB so a flood cannot tie up the shared pool
+    if not ingest_concurrency.try_acquire():
+        ingest_rejected.inc("concurrency")
+        raise _too_many("Ingest busy", 1)
+    try:
+        yield
+    finally:
+        ingest_concurrency.release()
+
+
+async def admit_agent(
+    _slot: None = Depends(ingest_slot),
+    ag: Agent = Depends(get_current_agent),
+) -> Agent:
+    wait = rate_limiter.admit(ag)
+    if wait > 0:
+        ingest_rejected.inc("rate")
+        raise _too_many("Rate limit exceeded", wait)
+    return ag
@@ -1,8 +1,12 @@
 import asyncio
+import time
 from typing import Any, Dict, Set
 
 from fastapi import WebSocket
 
+from app.metrics import ws_connections, ws_fanout_latency, ws_messages
+from app.tracing import span
+
 
 class Broadcaster:
     def __init__(self):
@@ -13,21 +17,29 @@ class Broadcaster:
         await ws.accept()
         async with self._lock:
             self._clients.add(ws)
+            ws_connections.set(value=len(self._clients))
 
     async def disconnect(self, ws: WebSocket):
         async with self._lock:
             self._clients.discard(ws)
+            ws_connections.set(value=len(self._clients))
 
     async def broadcast(self, msg: Dict[str, Any]):
         dead = []
-        async with self._lock:
-            for ws in list(self._clients):
-                try:
-                    await ws.send_json(msg)
-                except Exception:
-                    dead.append(ws)
-            for ws in dead:
-                self._clients.discard(ws)
+        t0 = time.perf_counter()
+        with span("ws.broadcast", type=msg.get("type")) as sp:
+            async with self._lock:
+                sp.set(clients=len(self._clients))
+                for ws in list(self._clients):
+                    try:
+                        await ws.send_json(msg)
+                    except Exception:
+                        dead.append(ws)
+                for ws in dead:
+                    self._clients.discard(ws)
+                ws_connections.set(value=len(self._clients))
+        ws_fanout_latency.observe(value=time.perf_counter() - t0)
+        ws_messages.inc(msg.get("type", "unknown"))
 
 
 broadcaster = Broadcaster()
\ No newline at end of file
@@ -0,0 +1,141 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from fastapi import Request
+from sqlalchemy import text
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.db import SessionLocal, make_engine
+from app.settings import settings
+
+# 0 when caught up (or not a standby at all, e.g. a plain local DB used as a stand-in)
+_LAG_SQL = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+_READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+LAST_WRITE_COOKIE = "last_write"
+LAST_WRITE_HEADER = "x-last-write"
+
+
+class Replica:
+    def __init__(self, name: str, url: str):
+        self.name = name
+        self.engine = make_engine(url, name=name)
+        self.Session = sessionmaker(bind=self.engine, autoflush=False, autocommit=False)
+        self.lag: Optional[float] = None
+        self.healthy = False
+        self.checked_at = 0.0
+        self.reads = 0
+        self._lock = threading.Lock()
+
+    def usable(self) -> bool:
+        now = time.monotonic()
+        if now - self.checked_at >= settings.REPLICA_LAG_CHECK_SECONDS and self._lock.acquire(blocking=False):
+            # one caller refreshes; the rest use the last known state
+            try:
+                self._check(now)
+            finally:
+                self._lock.release()
+        return self.healthy
+
+    def _check(self, now: float):
+        try:
+            with self.engine.connect() as conn:
+                self.lag = float(conn.execute(_LAG_SQL).scalar() or 0)
+            self.healthy = self.lag <= settings.REPLICA_MAX_LAG_SECONDS
+        except Exception:
+            self.lag = None
+            self.healthy = False
+        self.checked_at = now
+
+
+class ReplicaRouter:
+    """
+    Routes read-only dependencies to a healthy replica (round-robin) and
+    everything else to the primary. A client that wrote within the last
+    REPLICA_STICKY_SECONDS keeps reading from the primary so it sees its
+    own writes (see wrote_recently); lagging or unreachable replicas are skipped.
+    """
+
+    def __init__(self, urls: List[str]):
+        self.replicas = [Replica(f"replica{i}", u) for i, u in enumerate(urls)]
+        self._next = 0
+        self.primary_reads = 0
+        self.sticky_reads = 0
+
+    def pick(self) -> Optional[Replica]:
+        n = len(self.replicas)
+        for _ in range(n):
+            r = self.replicas[self._next % n]
+            self._next += 1
+            if r.usable():
+                return r
+        return None
+
+    def read_session(self, sticky: bool = False) -> Session:
+        if self.replicas:
+            if sticky:
+                self.sticky_reads += 1
+            else:
+                r = self.pick()
+                if r is not None:
+                    r.reads += 1
+                    return r.Session()
+        self.primary_reads += 1
+        return SessionLocal()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "primary_reads": self.primary_reads,
+            "sticky_reads": self.sticky_reads,
+            "replicas": {
+                r.name: {"healthy": r.healthy, "lag_seconds": r.lag, "reads": r.reads}
+                for r in self.replicas
+            },
+        }
+
+
+def wrote_recently(request: Request) -> bool:
+    # the client carries its last write time (cookie, or echoed header for non-browser
+    # clients), so stickiness holds whichever worker served the write
+    raw = request.headers.get(LAST_WRITE_HEADER) or request.cookies.get(LAST_WRITE_COOKIE)
+    if not raw:
+        return False
+    try:
+        age = time.time() - float(raw)
+    except ValueError:
+        return False
+    return 0 <= age < settings.REPLICA_STICKY_SECONDS
+
+
+async def track_writes(request: Request, call_next):
+    # only installed when replicas are configured (main.py)
+    response = await call_next(request)
+    if request.method not in _READ_METHODS and response.status_code < 400:
+        now = f"{time.time():.3f}"
+        response.headers[LAST_WRITE_HEADER] = now
+        response.set_cookie(
+            LAST_WRITE_COOKIE, now, max_age=max(1, int(settings.REPLICA_STICKY_SECONDS)), httponly=True, samesite="lax"
+        )
+    return response
+
+
+def get_read_db(request: Request):
+    """Like get_db, for read-only routes: may be served by a replica."""
+    db = replica_router.read_session(wrote_recently(request))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+replica_router = ReplicaRouter([u.strip() for u in settings.DATABASE_REPLICA_URLS.split(",") if u.strip()])
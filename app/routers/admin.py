@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.db import pool_stats
+from app.deps import require_roles, AuthedUser
+from app.evidence import evidence_store
+from app.ratelimit import rate_limiter, ingest_concurrency
+from app.replicas import replica_router
+from app.settings import settings
+from app.shards import shard_router
+from app.sqlprofile import recent as recent_profiles
+from app.tracing import exporter
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/ratelimits")
+def ratelimit_stats(
+    au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR")),
+):
+    # Which agent/site is pushing the system: compare allowed/rejected per bucket
+    return {
+        "concurrency": ingest_concurrency.stats(),
+        **rate_limiter.stats(),
+    }
+
+
+@router.get("/pool")
+def pool_gauges(
+    au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR")),
+):
+    return {name: st.snapshot() for name, st in pool_stats.items()}
+
+
+@router.get("/replicas")
+def replica_status(
+    au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR")),
+):
+    return replica_router.stats()
+
+
+@router.get("/profile")
+def sql_profiles(
+    sort: str = "db_ms",
+    limit: int = 50,
+    au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR")),
+):
+    # Recent requests seen with SQL_PROFILE on, worst first (db_ms | queries | repeated)
+    if sort not in ("db_ms", "queries", "repeated", "at"):
+        sort = "db_ms"
+    rows = sorted(list(recent_profiles), key=lambda p: p[sort], reverse=True)
+    return rows[: max(1, min(limit, 500))]
+
+
+@router.get("/traces")
+def recent_traces(
+    limit: int = 50,
+    au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR")),
+):
+    return exporter.recent(max(1, min(limit, 500)))
+
+
+@router.get("/traces/{trace_id}")
+def get_trace(
+    trace_id: str,
+    au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR")),
+):
+    t = exporter.get(trace_id.lower())
+    if not t:
+        raise HTTPException(404, "Trace not found")
+    return t
+
+
+@router.post("/evidence/purge")
+def purge_evidence(
+    older_than_days: int | None = None,
+    au: AuthedUser = Depends(require_roles("ADMIN")),
+):
+    # retention: evidence rows of old events go, stored frames only once no row references them
+    days = older_than_days if older_than_days is not None else settings.EVIDENCE_RETENTION_DAYS
+    if days < 1:
+        raise HTTPException(400, "older_than_days must be at least 1")
+    before = datetime.utcnow() - timedelta(days=days)
+    parts = shard_router.scatter(lambda shard: evidence_store.purge(shard, before))
+    return {
+        "evidence_rows": sum(p["evidence_rows"] for p in parts),
+        "blobs_deleted": sum(p["blobs_deleted"] for p in parts),
+    }
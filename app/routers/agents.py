@@ -1,18 +1,37 @@
 import secrets
+import time
 from datetime import datetime, timezone
 from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db import get_db
+from app.db import get_db, get_async_db
 from app.deps import require_roles, AuthedUser
 from app.security import hash_password
 from app.agent_auth import get_current_agent
+from app.camera_registry import camera_registry
+from app.config_versions import config_etag, config_notifier, get_config_version
+from app.backfill import BackfillError, NDJSONDecoder, get_watermark, load_chunk, parse_line
+from app.embeddings import embedding_store
+from app.escalation import escalations
+from app.evidence import evidence_store
+from app.guests import guest_registry
+from app.ingest import ingest_queue, IngestOverloaded
+from app.metrics import ingest_events, ingest_rejected
+from app.occupancy import occupancy
+from app.ratelimit import admit_agent
 from app.realtime import broadcaster
-from app.storage import put_evidence_from_b64
-from db.models import Agent, Camera, Event, Evidence, Site
+from app.settings import settings
+from app.tracing import span
+from app.shards import shard_router
+from app.storage import evidence_urls
+from db.models import Agent, Camera, Event, Site
 
 
 router = APIRouter(prefix="/agent", tags=["agent"])
@@ -65,6 +84,42 @@ def admin_create_agent(
     )
 
 
+class AgentLimitsIn(BaseModel):
+    # NULL resets to the settings defaults; <= 0 disables the agent bucket
+    rate_limit_per_sec: Optional[float] = None
+    rate_limit_burst: Optional[int] = Field(default=None, ge=1)
+
+
+class AgentLimitsOut(BaseModel):
+    id: int
+    site_id: int
+    rate_limit_per_sec: Optional[float]
+    rate_limit_burst: Optional[int]
+
+
+@router.put("/{agent_id}/limits", response_model=AgentLimitsOut)
+def admin_set_agent_limits(
+    agent_id: int,
+    payload: AgentLimitsIn,
+    db: Session = Depends(get_db),
+    au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR")),
+):
+    ag = db.get(Agent, agent_id)
+    if not ag:
+        raise HTTPException(404, "Agent not found")
+
+    ag.rate_limit_per_sec = payload.rate_limit_per_sec
+    ag.rate_limit_burst = payload.rate_limit_burst
+    db.commit()
+
+    return AgentLimitsOut(
+        id=ag.id,
+        site_id=ag.site_id,
+        rate_limit_per_sec=ag.rate_limit_per_sec,
+        rate_limit_burst=ag.rate_limit_burst,
+    )
+
+
 # ---------- Edge agent operations ----------
 
 class CameraConfigOut(BaseModel):
@@ -76,18 +131,16 @@ class CameraConfigOut(BaseModel):
     enabled: bool
 
 
-@router.get("/config", response_model=list[CameraConfigOut])
-def agent_config(
-    db: Session = Depends(get_db),
-    ag: Agent = Depends(get_current_agent),
-):
+async def _load_config(db: AsyncSession, site_id: int) -> tuple[int, list[CameraConfigOut]]:
+    version = await get_config_version(db, site_id)
     cams = (
-        db.query(Camera)
-        .filter(Camera.site_id == ag.site_id)
-        .order_by(Camera.id.asc())
-        .all()
-    )
-    return [
+        await db.scalars(
+            select(Camera)
+            .where(Camera.site_id == site_id)
+            .order_by(Camera.id.asc())
+        )
+    ).all()
+    return version, [
         CameraConfigOut(
             id=c.id,
             site_id=c.site_id,
@@ -100,6 +153,114 @@ def agent_config(
     ]
 
 
+@router.get("/config", response_model=list[CameraConfigOut])
+async def agent_config(
+    request: Request,
+    wait: int = 0,
+    db: AsyncSession = Depends(get_async_db),
+    ag: Agent = Depends(get_current_agent),
+):
+    """
+    Returns the site's camera list with an ETag. Send it back as If-None-Match:
+    an unchanged config answers 304 after one version lookup. With `wait=N`
+    an unchanged config is held for up to N seconds until the version moves.
+    """
+    site_id = ag.site_id
+    inm = request.headers.get("if-none-match")
+
+    async def current_version() -> int:
+        try:
+            return await get_config_version(db, site_id)
+        finally:
+            # end the read so a long-poll doesn't pin a pooled connection
+            await db.rollback()
+
+    version = await current_version()
+    if inm == config_etag(site_id, version) and wait > 0:
+        deadline = time.monotonic() + min(wait, settings.AGENT_CONFIG_MAX_WAIT)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            # woken directly for changes in this worker; re-check covers other workers
+            await config_notifier.wait(site_id, timeout=min(remaining, 5.0))
+            version = await current_version()
+            if inm != config_etag(site_id, version):
+                break
+
+    etag = config_etag(site_id, version)
+    if inm == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    version, cams = await _load_config(db, site_id)
+    return JSONResponse(
+        content=[c.model_dump() for c in cams],
+        headers={"ETag": config_etag(site_id, version)},
+    )
+
+
+class HeartbeatIn(BaseModel):
+    version: Optional[str] = Field(default=None, max_length=50)
+
+
+@router.post("/heartbeat")
+async def agent_heartbeat(
+    payload: HeartbeatIn | None = None,
+    db: AsyncSession = Depends(get_async_db),
+    ag: Agent = Depends(get_current_agent),
+):
+    # liveness itself is recorded by get_current_agent, like on every agent call
+    if payload and payload.version and payload.version != ag.version:
+        await db.execute(update(Agent).where(Agent.id == ag.id).values(version=payload.version))
+        await db.commit()
+    return {"ok": True, "offline_after": settings.AGENT_OFFLINE_SECONDS}
+
+
+# ---------- Agent syncs admitted guests ----------
+
+class GuestSyncOut(BaseModel):
+    # pass back as ?since= on the next sync
+    token: str
+    # true: upserts is the complete list, drop anything not in it
+    full: bool
+    upserts: list[dict]
+    removed: list[int]
+
+
+@router.get("/guests", response_model=GuestSyncOut)
+async def agent_guests(
+    since: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db),
+    ag: Agent = Depends(get_current_agent),
+):
+    # guests written since the token's version, plus deletions/expiries since then
+    return await db.run_sync(lambda s: guest_registry.delta(s, ag.site_id, since))
+
+
+@router.get("/embeddings")
+async def agent_embeddings(
+    since: Optional[int] = None,
+    ag: Agent = Depends(get_current_agent),
+):
+    # binary blob (layout in app/embeddings.py): the site's whole matrix, or the delta after `since`
+    site = embedding_store.site(ag.site_id)
+
+    def current_version() -> int:
+        site.refresh()
+        return site.version
+
+    if since is not None and since == await run_in_threadpool(current_version):
+        return Response(status_code=304, headers={"X-Embedding-Version": str(since)})
+    blob, version, full = await run_in_threadpool(site.blob, since)
+    return Response(
+        content=blob,
+        media_type="application/octet-stream",
+        headers={"X-Embedding-Version": str(version), "X-Embedding-Full": "1" if full else "0"},
+    )
+
+
+# ---------- Agent pushes events ----------
+
 class AgentEventIn(BaseModel):
     camera_id: int
     ts: Optional[datetime] = None
@@ -128,36 +289,67 @@ class AgentEventOut(BaseModel):
 @router.post("/events", response_model=AgentEventOut)
 async def agent_push_event(
     payload: AgentEventIn,
-    db: Session = Depends(get_db),
-    ag: Agent = Depends(get_current_agent),
+    db: AsyncSession = Depends(get_async_db),
+    ag: Agent = Depends(admit_agent),
 ):
-    cam = db.get(Camera, payload.camera_id)
+    with span("camera.lookup", camera_id=payload.camera_id):
+        cam = await camera_registry.aget(db, payload.camera_id)
     if not cam or cam.site_id != ag.site_id:
         raise HTTPException(403, "Camera not allowed for this agent")
     if not cam.enabled:
         raise HTTPException(400, "Camera disabled")
 
     ts = payload.ts or datetime.now(timezone.utc)
+    shard = shard_router.for_site(cam.site_id)
 
-    ev = Event(
-        camera_id=payload.camera_id,
-        ts=ts,
-        type=payload.type,
-        person_name=payload.person_name,
-        similarity=payload.similarity,
-        status=payload.status,
-    )
-    db.add(ev)
-    db.commit()
-    db.refresh(ev)
+    if settings.INGEST_GROUP_COMMIT:
+        row = {
+            "camera_id": payload.camera_id,
+            "ts": ts,
+            "type": payload.type,
+            "person_name": payload.person_name,
+            "similarity": payload.similarity,
+            "status": payload.status,
+        }
+        try:
+            with span("db.group_commit", shard=shard.index):
+                ev_id = await ingest_queue.submit(row, shard)
+        except IngestOverloaded:
+            ingest_rejected.inc("queue_full")
+            raise HTTPException(503, "Ingest queue full", headers={"Retry-After": "1"})
+        ev = Event(id=ev_id, **row)
+    else:
+        ev = Event(
+            camera_id=payload.camera_id,
+            ts=ts,
+            type=payload.type,
+            person_name=payload.person_name,
+            similarity=payload.similarity,
+            status=payload.status,
+        )
+        with span("db.insert_event", shard=shard.index):
+            async with shard.AsyncSession() as edb:
+                edb.add(ev)
+                await edb.commit()
+                await edb.refresh(ev)
 
     evidence_key = None
     if payload.evidence_b64:
-        evidence_key = put_evidence_from_b64(payload.evidence_b64, prefix="evidence")
-        if evidence_key:
-            evid = Evidence(event_id=ev.id, image_key=evidence_key, thumb_key=None, annotations_json=None)
-            db.add(evid)
-            db.commit()
+        # hashing, the stored-digest check and boto3 are blocking
+        blob = await run_in_threadpool(evidence_store.put, payload.evidence_b64, shard)
+        if blob:
+            with span("db.insert_evidence", shard=shard.index, uploaded=blob.uploaded):
+                async with shard.AsyncSession() as edb:
+                    await evidence_store.attach(edb, ev.id, blob)
+                    await edb.commit()
+            evidence_key = blob.key
+
+    ingest_events.inc(cam.site_id, ag.id, "queue" if settings.INGEST_GROUP_COMMIT else "live")
+
+    evidence_url = None
+    if evidence_key:
+        # presigned (and cached) so dashboards load the frame straight from storage
+        evidence_url = (await run_in_threadpool(evidence_urls, {ev.id: evidence_key}))[ev.id]
 
     # broadcast full payload so guard dashboard updates instantly
     await broadcaster.broadcast(
@@ -176,9 +368,13 @@ async def agent_push_event(
                 "handled_at": ev.handled_at.isoformat() if ev.handled_at else None,
                 "notes": ev.notes,
                 "evidence_key": evidence_key,
+                "evidence_url": evidence_url,
             },
         }
     )
+    await occupancy.record(cam.site_id, cam.role, ev)
+    if ev.status == "open":
+        escalations.arm(ev.id, cam, ev.ts, ev.type, ev.person_name)
 
     return AgentEventOut(
         id=ev.id,
@@ -189,4 +385,89 @@ async def agent_push_event(
         similarity=ev.similarity,
         status=ev.status,
         evidence_key=evidence_key,
-    )
\ No newline at end of file
+    )
+
+
+# ---------- Bulk backfill after an outage ----------
+
+class BackfillStateOut(BaseModel):
+    agent_id: int
+    acked_seq: int
+
+
+class BackfillResultOut(BaseModel):
+    acked_seq: int
+    inserted: int
+    skipped: int  # seq already acknowledged by an earlier upload
+    rejected: int  # camera not in this agent's site
+
+
+@router.get("/backfill", response_model=BackfillStateOut)
+def agent_backfill_state(ag: Agent = Depends(get_current_agent)):
+    # Agents resume by re-sending everything after acked_seq
+    return BackfillStateOut(agent_id=ag.id, acked_seq=get_watermark(ag.id, ag.site_id))
+
+
+@router.post("/backfill", response_model=BackfillResultOut)
+async def agent_backfill(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    ag: Agent = Depends(admit_agent),
+):
+    """
+    Body: NDJSON, one BackfillEventIn per line, ordered by `seq`.
+    Send `Content-Encoding: gzip` for a gzip-compressed body.
+    Rows are committed in chunks; backfilled events are not broadcast.
+    """
+    agent_id = ag.id
+    site_id = ag.site_id
+    acked = await run_in_threadpool(get_watermark, agent_id, site_id)
+    camera_ids = set(await camera_registry.asite_camera_ids(db, ag.site_id))
+    # don't hold a pooled connection for the length of the upload
+    await db.close()
+
+    gzipped = request.headers.get("content-encoding", "").lower() == "gzip"
+    decoder = NDJSONDecoder(gzipped, settings.BACKFILL_MAX_LINE_BYTES)
+
+    inserted = skipped = rejected = 0
+    chunk = []
+    last_seq = acked
+
+    async def flush():
+        nonlocal inserted, acked
+        res = await run_in_threadpool(load_chunk, agent_id, site_id, chunk, last_seq)
+        ingest_events.inc(site_id, agent_id, "backfill", value=res["inserted"])
+        inserted += res["inserted"]
+        acked = res["acked_seq"]
+        chunk.clear()
+
+    def take(line: bytes):
+        nonlocal skipped, rejected, last_seq
+        row = parse_line(line)
+        if row.seq <= last_seq:
+            if row.seq <= acked:
+                skipped += 1
+                return
+            raise BackfillError(f"seq {row.seq} is not increasing")
+        last_seq = row.seq
+        if row.camera_id not in camera_ids:
+            # still advances the watermark: the row can never be accepted
+            rejected += 1
+            return
+        chunk.append(row)
+
+    try:
+        async for body in request.stream():
+            for line in decoder.feed(body):
+                take(line)
+                if len(chunk) >= settings.BACKFILL_CHUNK_ROWS:
+                    await flush()
+        for line in decoder.close():
+            take(line)
+        if last_seq > acked:
+            await flush()
+    except BackfillError as e:
+        # Chunks committed so far stay committed; the agent resumes from acked_seq
+        raise HTTPException(400, f"{e} (acked_seq={acked})")
+
+    return BackfillResultOut(acked_seq=acked, inserted=inserted, skipped=skipped, rejected=rejected)
@@ -1,9 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.db import get_db
 from app.deps import require_roles, AuthedUser
-from app.schemas import CameraCreate, CameraOut
+from app.camera_registry import camera_registry
+from app.replicas import get_read_db
+from app.config_versions import bump_config_version, config_notifier
+from app.fastpath import CAMERA_COLUMNS, rows_response
+from app.schemas import CameraCreate, CameraUpdate, CameraOut
 from db.models import Camera
 
 router = APIRouter(prefix="/cameras", tags=["cameras"])
@@ -24,29 +29,33 @@ def create_camera(
         role=payload.role,
         stream_url=payload.stream_url,
         enabled=payload.enabled,
+        escalation_seconds=payload.escalation_seconds,
     )
     db.add(cam)
+    bump_config_version(db, payload.site_id)
     db.commit()
     db.refresh(cam)
+    camera_registry.put(cam)
+    config_notifier.notify(cam.site_id)
     return cam
 
 
 @router.get("", response_model=list[CameraOut])
 def list_cameras(
     site_id: int | None = None,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR", "GUARD")),
 ):
-    q = db.query(Camera)
+    q = select(*CAMERA_COLUMNS)
 
     if au.user.role == "GUARD":
         if au.site_id is None:
             return []
-        q = q.filter(Camera.site_id == au.site_id)
+        q = q.where(Camera.site_id == au.site_id)
     elif site_id is not None:
-        q = q.filter(Camera.site_id == site_id)
+        q = q.where(Camera.site_id == site_id)
 
-    return q.order_by(Camera.id.asc()).all()
+    return rows_response(db.execute(q.order_by(Camera.id.asc())))
 
 
 @router.get("/{camera_id}", response_model=CameraOut)
@@ -55,9 +64,33 @@ def get_camera(
     db: Session = Depends(get_db),
     au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR", "GUARD")),
 ):
-    cam = db.get(Camera, camera_id)
+    cam = camera_registry.get(db, camera_id)
     if not cam:
         raise HTTPException(404, "Camera not found")
     from app.deps import guard_site_scope
     guard_site_scope(au, cam.site_id)
-    return cam
\ No newline at end of file
+    return cam
+
+
+@router.patch("/{camera_id}", response_model=CameraOut)
+def update_camera(
+    camera_id: int,
+    payload: CameraUpdate,
+    db: Session = Depends(get_db),
+    au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR")),
+):
+    cam = db.get(Camera, camera_id)
+    if not cam:
+        raise HTTPException(404, "Camera not found")
+
+    for field, value in payload.model_dump(exclude_unset=True).items():
+        if value is None and field not in ("stream_url", "escalation_seconds"):
+            continue
+        setattr(cam, field, value)
+
+    bump_config_version(db, cam.site_id)
+    db.commit()
+    db.refresh(cam)
+    camera_registry.put(cam)
+    config_notifier.notify(cam.site_id)
+    return cam
@@ -0,0 +1,31 @@
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Response
+
+from app.dashboard import snapshot_cache
+from app.deps import require_roles, AuthedUser, guard_site_scope
+
+router = APIRouter(prefix="/dashboard", tags=["dashboard"])
+
+
+@router.get("/snapshot")
+def dashboard_snapshot(
+    site_id: int | None = None,
+    au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR", "GUARD")),
+):
+    # everything a dashboard needs on load; guards get their own site
+    if au.user.role == "GUARD":
+        site_id = au.site_id
+    if site_id is None:
+        raise HTTPException(400, "site_id required")
+    guard_site_scope(au, site_id)
+
+    body = snapshot_cache.get(site_id)
+    if body is None:
+        raise HTTPException(404, "Site not found")
+
+    u = au.user
+    me = orjson.dumps({
+        "id": u.id, "org_id": u.org_id, "name": u.name, "email": u.email, "role": u.role, "site_id": au.site_id,
+    })
+    # the site part is shared between callers; splice the caller in front of it
+    return Response(content=b'{"me":' + me + b"," + body[1:], media_type="application/json")
@@ -0,0 +1,120 @@
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+from sqlalchemy.orm import Session
+
+from app.db import get_db
+from app.deps import require_roles, AuthedUser, guard_site_scope
+from app.embeddings import EmbeddingError, embedding_store
+from app.identify import identify_cache
+from app.settings import settings
+from db.models import Guest, Site
+
+router = APIRouter(prefix="/embeddings", tags=["embeddings"])
+
+Kind = Literal["guest", "resident"]
+
+
+class EmbeddingIn(BaseModel):
+    # defaults to the guest's name for kind=guest
+    label: str | None = Field(default=None, max_length=64)
+    vector: list[float]
+
+
+class EmbeddingWriteOut(BaseModel):
+    version: int
+
+
+class IdentifyIn(BaseModel):
+    vectors: list[list[float]] = Field(min_length=1)
+    k: int = Field(default=5, ge=1, le=100)
+    min_similarity: float | None = None
+    # skip the IVF index and score every row
+    exact: bool = False
+
+
+def _check_subject(db: Session, site_id: int, kind: str, ref: int) -> str:
+    if not db.get(Site, site_id):
+        raise HTTPException(404, "Site not found")
+    if kind == "guest":
+        g = db.get(Guest, ref)
+        if not g or g.site_id != site_id or g.deleted_at is not None:
+            raise HTTPException(404, "Guest not found")
+        return g.name
+    return f"resident-{ref}"
+
+
+@router.put("/{site_id}/{kind}/{ref}", response_model=EmbeddingWriteOut)
+def put_embedding(
+    site_id: int,
+    kind: Kind,
+    ref: int,
+    payload: EmbeddingIn,
+    db: Session = Depends(get_db),
+    au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR", "GUARD")),
+):
+    guard_site_scope(au, site_id)
+    default_label = _check_subject(db, site_id, kind, ref)
+    try:
+        version = embedding_store.site(site_id).upsert(kind, ref, payload.label or default_label, payload.vector)
+    except EmbeddingError as e:
+        raise HTTPException(400, str(e))
+    return EmbeddingWriteOut(version=version)
+
+
+@router.delete("/{site_id}/{kind}/{ref}", response_model=EmbeddingWriteOut)
+def delete_embedding(
+    site_id: int,
+    kind: Kind,
+    ref: int,
+    au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR", "GUARD")),
+):
+    guard_site_scope(au, site_id)
+    version = embedding_store.site(site_id).delete(kind, ref)
+    if version is None:
+        raise HTTPException(404, "Embedding not found")
+    return EmbeddingWriteOut(version=version)
+
+
+@router.get("/{site_id}")
+def embedding_stats(
+    site_id: int,
+    au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR", "GUARD")),
+):
+    guard_site_scope(au, site_id)
+    s = embedding_store.site(site_id)
+    lv = s.live()
+    return {
+        "version": lv.version,
+        "live": len(lv.ref),
+        "dead_fraction": round(s.dead_fraction(), 4),
+        "dim": s.dim,
+        "dtype": str(s.dtype),
+        "bytes": int(lv.matrix.nbytes),
+    }
+
+
+@router.post("/{site_id}/compact")
+def compact_embeddings(
+    site_id: int,
+    au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR")),
+):
+    return embedding_store.site(site_id).compact()
+
+
+@router.post("/{site_id}/identify")
+def identify(
+    site_id: int,
+    payload: IdentifyIn,
+    au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR", "GUARD")),
+):
+    # top-k matches per query vector against the site's current guests/residents
+    guard_site_scope(au, site_id)
+    if len(payload.vectors) > settings.IDENTIFY_MAX_QUERIES:
+        raise HTTPException(400, f"At most {settings.IDENTIFY_MAX_QUERIES} vectors per request")
+    try:
+        version, matches = identify_cache.identify(site_id, payload.vectors, payload.k, payload.min_similarity, payload.exact)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return {"version": version, "matches": matches}
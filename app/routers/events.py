@@ -1,39 +1,97 @@
+import heapq
+import os
 from datetime import datetime, timezone
+from itertools import islice
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import FileResponse, RedirectResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.db import get_db
+from app.db import get_db, get_async_db
+from app.camera_registry import camera_registry
+from app.replicas import get_read_db, wrote_recently
 from app.deps import require_roles, AuthedUser, guard_site_scope
+from app.escalation import escalations
+from app.fastpath import EVENT_COLUMNS, dicts_response, rows_response
 from app.schemas import EventOut, EventActionIn
 from app.realtime import broadcaster
-from db.models import Event, Camera
+from app.shards import shard_router
+from app.storage import evidence_urls as resolve_evidence_urls, local_path, presign_cache, s3_enabled
+from db.models import Event, Evidence
 
 router = APIRouter(prefix="/events", tags=["events"])
 
 
+def _with_evidence_urls(rows, sticky: bool) -> list[dict]:
+    # one Evidence query per shard for the whole page; latest evidence per event wins
+    by_shard: dict[int, list[int]] = {}
+    for r in rows:
+        by_shard.setdefault(shard_router.for_event(r.id).index, []).append(r.id)
+    keys: dict[int, str] = {}
+    for index, ids in by_shard.items():
+        with shard_router.read_session(shard_router.shards[index], sticky) as s:
+            keys.update(s.execute(
+                select(Evidence.event_id, Evidence.image_key)
+                .where(Evidence.event_id.in_(ids))
+                .order_by(Evidence.id.asc())
+            ).tuples())
+    urls = resolve_evidence_urls(keys)
+    return [{**r._asdict(), "evidence_url": urls.get(r.id)} for r in rows]
+
+
 @router.get("", response_model=list[EventOut])
 def list_events(
+    request: Request,
     status: str | None = None,
     camera_id: int | None = None,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    evidence_urls: bool = False,
+    db: Session = Depends(get_read_db),
     au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR", "GUARD")),
 ):
-    q = db.query(Event).join(Camera, Event.camera_id == Camera.id)
+    limit = min(limit, 500)
+    q = select(*EVENT_COLUMNS)
 
+    # Narrow to one site (and so one event shard) whenever we can
+    site_id = None
     if au.user.role == "GUARD":
         if au.site_id is None:
             return []
-        q = q.filter(Camera.site_id == au.site_id)
+        site_id = au.site_id
+        cam_ids = camera_registry.site_camera_ids(db, site_id)
+        if not cam_ids:
+            return []
+        q = q.where(Event.camera_id.in_(cam_ids))
     # else admins can filter by camera_id/status as before
 
-    if status:
-        q = q.filter(Event.status == status)
     if camera_id:
-        q = q.filter(Event.camera_id == camera_id)
+        cam = camera_registry.get(db, camera_id)
+        if not cam:
+            return []
+        site_id = cam.site_id
+        q = q.where(Event.camera_id == camera_id)
+    if status:
+        q = q.where(Event.status == status)
+
+    q = q.order_by(Event.ts.desc()).limit(limit)
+    sticky = wrote_recently(request)
+
+    def fetch(shard):
+        with shard_router.read_session(shard, sticky) as s:
+            return s.execute(q).all()
 
-    return q.order_by(Event.ts.desc()).limit(min(limit, 500)).all()
+    if site_id is not None:
+        rows = fetch(shard_router.for_site(site_id))
+    else:
+        # cross-site: scatter to every shard, merge the per-shard top-N by ts
+        parts = shard_router.scatter(fetch)
+        rows = list(islice(heapq.merge(*parts, key=lambda e: e.ts, reverse=True), limit))
+
+    if evidence_urls:
+        return dicts_response(_with_evidence_urls(rows, sticky))
+    return rows_response(rows)
 
 
 @router.get("/{event_id}", response_model=EventOut)
@@ -42,10 +100,11 @@ def get_event(
     db: Session = Depends(get_db),
     au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR", "GUARD")),
 ):
-    ev = db.get(Event, event_id)
+    with shard_router.for_event(event_id).Session() as edb:
+        ev = edb.get(Event, event_id)
     if not ev:
         raise HTTPException(404, "Event not found")
-    cam = db.get(Camera, ev.camera_id)
+    cam = camera_registry.get(db, ev.camera_id)
     if not cam:
         raise HTTPException(404, "Camera not found for event")
 
@@ -53,37 +112,89 @@ def get_event(
     return ev
 
 
-@router.post("/{event_id}/action", response_model=EventOut)
-async def act_on_event(
+@router.get("/{event_id}/evidence")
+def get_event_evidence(
     event_id: int,
-    payload: EventActionIn,
+    request: Request,
+    thumb: bool = False,
     db: Session = Depends(get_db),
     au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR", "GUARD")),
 ):
-    ev = db.get(Event, event_id)
-    if not ev:
+    with shard_router.for_event(event_id).Session() as edb:
+        row = edb.execute(
+            select(Event.camera_id, Evidence.image_key, Evidence.thumb_key)
+            .outerjoin(Evidence, Evidence.event_id == Event.id)
+            .where(Event.id == event_id)
+            .order_by(Evidence.id.desc())
+            .limit(1)
+        ).first()
+    if not row:
         raise HTTPException(404, "Event not found")
-    
-    cam = db.get(Camera, ev.camera_id)
+    cam = camera_registry.get(db, row.camera_id)
     if not cam:
         raise HTTPException(404, "Camera not found for event")
-
     guard_site_scope(au, cam.site_id)
+    if row.image_key is None:
+        raise HTTPException(404, "No evidence for event")
+
+    key = row.thumb_key if thumb and row.thumb_key else row.image_key
+    path = local_path(key)
+    try:
+        st = os.stat(path) if path else None
+    except FileNotFoundError:
+        st = None
+    if st is None:
+        if s3_enabled():
+            return RedirectResponse(presign_cache.get(key), status_code=307)
+        raise HTTPException(404, "Evidence file missing")
+
+    # keys are never rewritten, so the file can be cached for good; FileResponse handles
+    # Range/If-Range and sends via http.response.pathsend where the server supports it
+    resp = FileResponse(
+        path, media_type="image/jpeg", stat_result=st, headers={"Cache-Control": "private, max-age=86400, immutable"}
+    )
+    if request.headers.get("if-none-match") == resp.headers["etag"]:
+        return Response(
+            status_code=304, headers={"ETag": resp.headers["etag"], "Cache-Control": resp.headers["cache-control"]}
+        )
+    return resp
 
-    # Basic validation
-    if payload.status == "dealt" and payload.decision not in ("entry_granted", "entry_denied"):
-        raise HTTPException(400, "decision required when status=dealt")
-    if payload.status != "dealt" and payload.decision is not None:
-        raise HTTPException(400, "decision only allowed when status=dealt")
-
-    ev.status = payload.status
-    ev.decision = payload.decision
-    ev.notes = payload.notes
-    ev.handled_by_user_id = au.user.id
-    ev.handled_at = datetime.now(timezone.utc)
 
-    db.commit()
-    db.refresh(ev)
+@router.post("/{event_id}/action", response_model=EventOut)
+async def act_on_event(
+    event_id: int,
+    payload: EventActionIn,
+    db: AsyncSession = Depends(get_async_db),
+    au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR", "GUARD")),
+):
+    async with shard_router.for_event(event_id).AsyncSession() as edb:
+        ev = await edb.get(Event, event_id)
+        if not ev:
+            raise HTTPException(404, "Event not found")
+
+        cam = await camera_registry.aget(db, ev.camera_id)
+        if not cam:
+            raise HTTPException(404, "Camera not found for event")
+
+        guard_site_scope(au, cam.site_id)
+
+        # Basic validation
+        if payload.status == "dealt" and payload.decision not in ("entry_granted", "entry_denied"):
+            raise HTTPException(400, "decision required when status=dealt")
+        if payload.status != "dealt" and payload.decision is not None:
+            raise HTTPException(400, "decision only allowed when status=dealt")
+
+        ev.status = payload.status
+        ev.decision = payload.decision
+        ev.notes = payload.notes
+        ev.handled_by_user_id = au.user.id
+        ev.handled_at = datetime.now(timezone.utc)
+
+        await edb.commit()
+        await edb.refresh(ev)
+
+    if ev.status != "open":
+        escalations.cancel(ev.id)
 
     # Realtime broadcast
     await broadcaster.broadcast(
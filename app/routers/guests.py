@@ -0,0 +1,131 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.db import get_db
+from app.deps import require_roles, AuthedUser, guard_site_scope
+from app.embeddings import embedding_store
+from app.fastpath import GUEST_COLUMNS, rows_response
+from app.guests import bump_guest_version, guest_registry, to_naive_utc
+from app.replicas import get_read_db
+from app.schemas import GuestCreate, GuestUpdate, GuestOut
+from db.models import Guest, Site
+
+router = APIRouter(prefix="/guests", tags=["guests"])
+
+
+@router.post("", response_model=GuestOut)
+def create_guest(
+    payload: GuestCreate,
+    db: Session = Depends(get_db),
+    au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR", "GUARD")),
+):
+    guard_site_scope(au, payload.site_id)
+    if not db.get(Site, payload.site_id):
+        raise HTTPException(400, "Invalid site_id")
+
+    g = Guest(
+        site_id=payload.site_id,
+        name=payload.name,
+        contact=payload.contact,
+        expires_at=to_naive_utc(payload.expires_at),
+        folder_key=payload.folder_key,
+        version=bump_guest_version(db, payload.site_id),
+    )
+    db.add(g)
+    db.commit()
+    db.refresh(g)
+    guest_registry.put(g)
+    return g
+
+
+@router.get("", response_model=list[GuestOut])
+def list_guests(
+    site_id: int | None = None,
+    include_expired: bool = False,
+    db: Session = Depends(get_read_db),
+    au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR", "GUARD")),
+):
+    q = select(*GUEST_COLUMNS).where(Guest.deleted_at.is_(None))
+
+    if au.user.role == "GUARD":
+        if au.site_id is None:
+            return []
+        q = q.where(Guest.site_id == au.site_id)
+    elif site_id is not None:
+        q = q.where(Guest.site_id == site_id)
+
+    if not include_expired:
+        q = q.where(Guest.expires_at > datetime.utcnow())
+
+    return rows_response(db.execute(q.order_by(Guest.expires_at.asc())))
+
+
+@router.get("/active")
+def active_guests(
+    site_id: int,
+    db: Session = Depends(get_db),
+    au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR", "GUARD")),
+):
+    # served from the in-memory active set, soonest expiry first
+    guard_site_scope(au, site_id)
+    return guest_registry.active(db, site_id)
+
+
+def _get_guest(db: Session, guest_id: int, au: AuthedUser) -> Guest:
+    g = db.get(Guest, guest_id)
+    if not g or g.deleted_at is not None:
+        raise HTTPException(404, "Guest not found")
+    guard_site_scope(au, g.site_id)
+    return g
+
+
+@router.get("/{guest_id}", response_model=GuestOut)
+def get_guest(
+    guest_id: int,
+    db: Session = Depends(get_db),
+    au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR", "GUARD")),
+):
+    return _get_guest(db, guest_id, au)
+
+
+@router.patch("/{guest_id}", response_model=GuestOut)
+def update_guest(
+    guest_id: int,
+    payload: GuestUpdate,
+    db: Session = Depends(get_db),
+    au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR", "GUARD")),
+):
+    g = _get_guest(db, guest_id, au)
+
+    for field, value in payload.model_dump(exclude_unset=True).items():
+        if value is None and field in ("name", "expires_at"):
+            continue
+        if field == "expires_at":
+            value = to_naive_utc(value)
+        setattr(g, field, value)
+
+    g.version = bump_guest_version(db, g.site_id)
+    db.commit()
+    db.refresh(g)
+    guest_registry.put(g)
+    return g
+
+
+@router.delete("/{guest_id}")
+def delete_guest(
+    guest_id: int,
+    db: Session = Depends(get_db),
+    au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR", "GUARD")),
+):
+    # soft delete: the row (with a new version) is what tells agents to drop the guest
+    g = _get_guest(db, guest_id, au)
+    g.deleted_at = datetime.utcnow()
+    g.version = bump_guest_version(db, g.site_id)
+    db.commit()
+    db.refresh(g)
+    guest_registry.put(g)
+    embedding_store.site(g.site_id).delete("guest", g.id)
+    return {"ok": True}
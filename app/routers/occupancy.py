@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends
+
+from app.deps import require_roles, AuthedUser, guard_site_scope
+from app.occupancy import occupancy
+from app.settings import settings
+
+router = APIRouter(prefix="/occupancy", tags=["occupancy"])
+
+
+@router.get("/{site_id}")
+def get_occupancy(
+    site_id: int,
+    names: bool = True,
+    au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR", "GUARD")),
+):
+    # in memory: headcount is O(1), names=false skips the list for fire-drill polling
+    guard_site_scope(au, site_id)
+    return occupancy.get(site_id).as_dict(names=names)
+
+
+@router.post("/{site_id}/rebuild")
+def rebuild_occupancy(
+    site_id: int,
+    days: int | None = None,
+    au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR")),
+):
+    return occupancy.rebuild(site_id, days or settings.OCCUPANCY_REBUILD_DAYS)
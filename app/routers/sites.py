@@ -1,8 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
 from app.db import get_db
+from app.replicas import get_read_db
 from app.deps import require_roles, AuthedUser
+from app.fastpath import SITE_COLUMNS, rows_response
 from app.schemas import SiteCreate, SiteOut
 from db.models import Site
 
@@ -24,20 +27,21 @@ def create_site(
 
 @router.get("", response_model=list[SiteOut])
 def list_sites(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR", "GUARD")),
 ):
+    q = select(*SITE_COLUMNS)
     if au.user.role == "GUARD":
         if au.site_id is None:
             return []
-        return db.query(Site).filter(Site.id == au.site_id).order_by(Site.id.asc()).all()
-    return db.query(Site).order_by(Site.id.asc()).all()
+        q = q.where(Site.id == au.site_id)
+    return rows_response(db.execute(q.order_by(Site.id.asc())))
 
 
 @router.get("/{site_id}", response_model=SiteOut)
 def get_site(
     site_id: int,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR", "GUARD")),
 ):
     if au.user.role == "GUARD":
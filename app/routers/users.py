@@ -3,6 +3,7 @@ from pydantic import BaseModel, EmailStr, Field
 from sqlalchemy.orm import Session
 
 from app.db import get_db
+from app.replicas import get_read_db
 from app.deps import require_roles, AuthedUser
 from app.security import hash_password
 from db.models import User, Site
@@ -70,7 +71,7 @@ def create_user(
 
 @router.get("", response_model=list[UserOut])
 def list_users(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     au: AuthedUser = Depends(require_roles("ADMIN", "SUPERVISOR")),
 ):
     rows = db.query(User).order_by(User.id.asc()).all()
@@ -51,6 +51,15 @@ class CameraCreate(BaseModel):
     role: CameraRole
     stream_url: Optional[str] = None
     enabled: bool = True
+    escalation_seconds: Optional[int] = Field(default=None, ge=0)
+
+
+class CameraUpdate(BaseModel):
+    name: Optional[str] = Field(default=None, min_length=1, max_length=200)
+    role: Optional[CameraRole] = None
+    stream_url: Optional[str] = None
+    enabled: Optional[bool] = None
+    escalation_seconds: Optional[int] = Field(default=None, ge=0)
 
 
 class CameraOut(BaseModel):
@@ -61,6 +70,7 @@ class CameraOut(BaseModel):
     stream_url: Optional[str]
     enabled: bool
     created_at: datetime
+    escalation_seconds: Optional[int]
 
 
 class EventOut(BaseModel):
@@ -75,6 +85,8 @@ class EventOut(BaseModel):
     handled_by_user_id: Optional[int]
     handled_at: Optional[datetime]
     notes: Optional[str]
+    # only with ?evidence_urls=true
+    evidence_url: Optional[str] = None
 
 
 class EventActionIn(BaseModel):
@@ -82,4 +94,30 @@ class EventActionIn(BaseModel):
     status: EventStatus
     # only meaningful if status == dealt
     decision: EventDecision = None
-    notes: Optional[str] = None
\ No newline at end of file
+    notes: Optional[str] = None
+
+
+class GuestCreate(BaseModel):
+    site_id: int
+    name: str = Field(min_length=1, max_length=200)
+    contact: Optional[str] = Field(default=None, max_length=100)
+    expires_at: datetime
+    folder_key: Optional[str] = None
+
+
+class GuestUpdate(BaseModel):
+    name: Optional[str] = Field(default=None, min_length=1, max_length=200)
+    contact: Optional[str] = Field(default=None, max_length=100)
+    expires_at: Optional[datetime] = None
+    folder_key: Optional[str] = None
+
+
+class GuestOut(BaseModel):
+    id: int
+    site_id: int
+    name: str
+    contact: Optional[str]
+    expires_at: datetime
+    folder_key: Optional[str]
+    version: int
+    created_at: datetime
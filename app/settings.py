@@ -1,9 +1,30 @@
+from typing import Dict, Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Settings(BaseSettings):
     DATABASE_URL: str
 
+    # Connection pool, per engine (each worker has a sync and an async engine)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0
+    DB_POOL_RECYCLE: int = 1800
+    # always = ping on every checkout, idle = only after DB_PRE_PING_IDLE_SECONDS unused, never
+    DB_PRE_PING: Literal["always", "idle", "never"] = "idle"
+    DB_PRE_PING_IDLE_SECONDS: float = 30.0
+
+    # Optional read replicas (comma-separated URLs) for list/read endpoints
+    DATABASE_REPLICA_URLS: str = ""
+    REPLICA_STICKY_SECONDS: float = 5.0
+    REPLICA_MAX_LAG_SECONDS: float = 5.0
+    REPLICA_LAG_CHECK_SECONDS: float = 2.0
+
+    # Optional event sharding by site (comma-separated URLs; empty = events on the primary).
+    # The shard count is baked into event ids (alembic 0007), so it cannot change later.
+    EVENT_SHARD_URLS: str = ""
+
     JWT_SECRET: str = "change-me-in-prod"
     JWT_ALG: str = "HS256"
     ACCESS_TOKEN_MINUTES: int = 30
@@ -15,6 +36,100 @@ class Settings(BaseSettings):
     S3_SECRET_KEY: str | None = None
     S3_BUCKET: str | None = None
     S3_REGION: str = "us-east-1"
+    # "local" writes evidence under LOCAL_STORAGE_DIR instead (single-box sites, dev, load tests);
+    # "auto" uses S3 when it is configured and local disk otherwise
+    STORAGE_BACKEND: Literal["auto", "s3", "local"] = "auto"
+    LOCAL_STORAGE_DIR: str = "data/evidence"
+    # Presigned evidence URLs live this long; cached (and reused) for most of that
+    EVIDENCE_URL_TTL: int = 900
+    EVIDENCE_URL_CACHE_MAX: int = 50000
+    # Evidence is content-addressed; this many recently stored keys skip the DB check
+    EVIDENCE_KNOWN_KEYS: int = 100000
+    # POST /admin/evidence/purge default: evidence of events older than this goes
+    EVIDENCE_RETENTION_DAYS: int = 90
+
+    # Group-commit ingest for /agent/events (off = one commit per event)
+    INGEST_GROUP_COMMIT: bool = False
+    INGEST_BATCH_MAX: int = 200
+    INGEST_FLUSH_MS: int = 10
+    INGEST_QUEUE_MAX: int = 5000
+    INGEST_ENQUEUE_TIMEOUT_MS: int = 1000
+
+    # Ingest admission control (rate <= 0 disables that bucket)
+    INGEST_MAX_CONCURRENCY: int = 64
+    INGEST_AGENT_RATE_PER_SEC: float = 20.0
+    INGEST_AGENT_BURST: int = 100
+    INGEST_SITE_RATE_PER_SEC: float = 100.0
+    INGEST_SITE_BURST: int = 500
+
+    # Bulk backfill (/agent/backfill)
+    BACKFILL_CHUNK_ROWS: int = 5000
+    BACKFILL_MAX_LINE_BYTES: int = 65536
+
+    # Skip argon2 for an agent key verified within this many seconds (0 = always verify)
+    AGENT_AUTH_CACHE_SECONDS: int = 300
+    # Upper bound for /agent/config?wait= long-polls
+    AGENT_CONFIG_MAX_WAIT: int = 60
+
+    # How stale the in-memory camera registry may get w.r.t. other workers' writes
+    CAMERA_REGISTRY_CHECK_SECONDS: float = 5.0
+
+    # Guest delta sync: removals are remembered this long; older agent tokens get a full list
+    GUEST_TOMBSTONE_SECONDS: int = 7 * 24 * 3600
+    # Longest the expiry sweeper sleeps between passes
+    GUEST_SWEEP_SECONDS: float = 30.0
+
+    # Face embeddings: one memory-mapped matrix per site (dim/dtype apply to new sites only)
+    EMBEDDINGS_DIR: str = "data/embeddings"
+    EMBEDDING_DIM: int = 512
+    EMBEDDING_DTYPE: Literal["float16", "float32"] = "float16"
+    # Compact a site in the background once this share of its rows is dead
+    EMBEDDING_COMPACT_RATIO: float = 0.3
+    EMBEDDING_COMPACT_MIN_ROWS: int = 1000
+    # Files of a compacted-away generation are kept this long for other workers still reading them
+    EMBEDDING_RETIRE_SECONDS: float = 60.0
+    # Server-side identify: sites with at least this many embeddings get an IVF index
+    IDENTIFY_IVF_MIN_ROWS: int = 20000
+    IDENTIFY_IVF_NPROBE: int = 8
+    IDENTIFY_MAX_QUERIES: int = 64
+
+    # Live occupancy: snapshot dirty sites this often; a rebuild replays this many days of events
+    OCCUPANCY_FLUSH_SECONDS: float = 5.0
+    OCCUPANCY_REBUILD_DAYS: int = 14
+    # An event transaction commits within this many seconds of its insert time; replay keeps
+    # a window this wide (with the ids already applied) so late commits are not missed
+    OCCUPANCY_COMMIT_SECONDS: float = 60.0
+
+    # Agent liveness: last_seen is written in batches this often; an agent not heard from for
+    # AGENT_OFFLINE_SECONDS is reported offline (checked once per wheel tick)
+    AGENT_SEEN_FLUSH_SECONDS: float = 5.0
+    AGENT_OFFLINE_SECONDS: float = 90.0
+    AGENT_WHEEL_TICK_SECONDS: float = 1.0
+
+    # Escalation of events left open: seconds after the event's ts (0 = never). A camera's
+    # escalation_seconds wins over the per-type map, e.g. ESCALATION_TYPE_SECONDS='{"unknown": 60}'
+    ESCALATION_SECONDS: int = 300
+    ESCALATION_TYPE_SECONDS: Dict[str, int] = {}
+    # Open events older than this are not re-armed at startup
+    ESCALATION_LOOKBACK_HOURS: int = 24
+
+    # Dashboard snapshot: shared per-site cache lifetime and how many recent events it carries
+    DASHBOARD_SNAPSHOT_TTL: float = 2.0
+    DASHBOARD_RECENT_EVENTS: int = 50
+
+    # Dev-only per-request SQL profiling (X-DB-* headers, /admin/profile, slow-request log)
+    SQL_PROFILE: bool = False
+    SQL_PROFILE_SLOW_MS: float = 100.0
+    SQL_PROFILE_MAX_QUERIES: int = 10
+    SQL_PROFILE_KEEP: int = 200
+
+    # Request tracing: fraction of requests sampled (an agent's traceparent flag overrides),
+    # /agent/events is always recorded and exported when slower than TRACE_SLOW_INGEST_MS (0 = off)
+    TRACE_SAMPLE_RATE: float = 0.0
+    TRACE_SLOW_INGEST_MS: float = 500.0
+    TRACE_KEEP: int = 500
+    # Also append exported traces to this JSON lines file
+    TRACE_FILE: str = ""
 
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
@@ -0,0 +1,69 @@
+import contextvars
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, TypeVar
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.db import AsyncSessionLocal, SessionLocal, make_async_engine, make_engine
+from app.replicas import replica_router
+from app.settings import settings
+
+T = TypeVar("T")
+
+
+class Shard:
+    def __init__(self, index: int, url: Optional[str]):
+        self.index = index
+        if url is None:
+            # unsharded: the primary holds the events
+            self.Session = SessionLocal
+            self.AsyncSession = AsyncSessionLocal
+        else:
+            name = f"shard{index}"
+            self.Session = sessionmaker(bind=make_engine(url, name=name), autoflush=False, autocommit=False)
+            self.AsyncSession = async_sessionmaker(
+                bind=make_async_engine(url, name=f"{name}-async"), autoflush=False, expire_on_commit=False
+            )
+
+
+class ShardRouter:
+    """
+    Places each site's events, evidence and backfill watermarks on one of N
+    databases (crc32(site_id) % N). Event ids are interleaved per shard
+    (shard k issues ids with (id - 1) % N == k), so an id alone finds its shard.
+    With no EVENT_SHARD_URLS there is a single shard: the primary.
+    """
+
+    def __init__(self, urls: List[str]):
+        self.enabled = bool(urls)
+        self.shards = [Shard(i, u) for i, u in enumerate(urls)] if urls else [Shard(0, None)]
+        self._pool = ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix="shard") if len(self.shards) > 1 else None
+
+    @property
+    def count(self) -> int:
+        return len(self.shards)
+
+    def for_site(self, site_id: int) -> Shard:
+        return self.shards[zlib.crc32(str(site_id).encode()) % self.count]
+
+    def for_event(self, event_id: int) -> Shard:
+        return self.shards[(event_id - 1) % self.count]
+
+    def read_session(self, shard: Shard, sticky: bool = False) -> Session:
+        # replicas only exist for the primary
+        if not self.enabled:
+            return replica_router.read_session(sticky)
+        return shard.Session()
+
+    def scatter(self, fn: Callable[[Shard], T]) -> List[T]:
+        """Run fn against every shard in parallel; results in shard order."""
+        if self._pool is None:
+            return [fn(s) for s in self.shards]
+        # carry request context (SQL profile, trace) into the worker threads
+        ctxs = [contextvars.copy_context() for _ in self.shards]
+        return list(self._pool.map(lambda c, s: c.run(fn, s), ctxs, self.shards))
+
+
+shard_router = ShardRouter([u.strip() for u in settings.EVENT_SHARD_URLS.split(",") if u.strip()])
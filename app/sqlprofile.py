@@ -0,0 +1,123 @@
+import logging
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.settings import settings
+
+log = logging.getLogger(__name__)
+
+_PARAM = re.compile(r"%\(\w+\)s|\$\d+|\?")
+_PARAM_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_SPACE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """Statement with parameters and expanded IN lists folded, for grouping repeats."""
+    s = _PARAM.sub("?", statement)
+    s = _PARAM_LIST.sub("?", s)
+    return _SPACE.sub(" ", s).strip()
+
+
+class RequestProfile:
+    __slots__ = ("method", "path", "started", "count", "db_time", "shapes", "_lock")
+
+    def __init__(self, method: str, path: str):
+        self.method = method
+        self.path = path
+        self.started = time.time()
+        self.count = 0
+        self.db_time = 0.0
+        # shape -> [executions, total seconds]
+        self.shapes: Dict[str, List[float]] = {}
+        # scatter reads run in several threads at once
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, elapsed: float):
+        shape = statement_shape(statement)
+        with self._lock:
+            self.count += 1
+            self.db_time += elapsed
+            s = self.shapes.get(shape)
+            if s is None:
+                self.shapes[shape] = [1, elapsed]
+            else:
+                s[0] += 1
+                s[1] += elapsed
+
+    def repeated(self) -> int:
+        """Extra executions of a shape already run in this request (N+1 signal)."""
+        return sum(int(n) - 1 for n, _ in self.shapes.values())
+
+    def top(self, n: int = 5) -> List[Dict[str, Any]]:
+        ranked = sorted(self.shapes.items(), key=lambda kv: kv[1][1], reverse=True)[:n]
+        return [{"sql": shape, "count": int(c), "ms": round(t * 1000, 3)} for shape, (c, t) in ranked]
+
+    def summary(self, status: int, elapsed: float) -> Dict[str, Any]:
+        return {
+            "method": self.method,
+            "path": self.path,
+            "status": status,
+            "at": self.started,
+            "ms": round(elapsed * 1000, 3),
+            "queries": self.count,
+            "db_ms": round(self.db_time * 1000, 3),
+            "repeated": self.repeated(),
+            "top": self.top(),
+        }
+
+
+_current: ContextVar[Optional[RequestProfile]] = ContextVar("sql_profile", default=None)
+recent: Deque[Dict[str, Any]] = deque(maxlen=settings.SQL_PROFILE_KEEP)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("_profile_t0", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    prof = _current.get()
+    stack = conn.info.get("_profile_t0")
+    if prof is None or not stack:
+        return
+    prof.record(statement, time.perf_counter() - stack.pop())
+
+
+if settings.SQL_PROFILE:
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+async def profile_sql(request: Request, call_next):
+    # only installed when SQL_PROFILE is set (main.py)
+    prof = RequestProfile(request.method, request.url.path)
+    token = _current.set(prof)
+    t0 = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        _current.reset(token)
+    elapsed = time.perf_counter() - t0
+
+    route = request.scope.get("route")
+    prof.path = getattr(route, "path", None) or prof.path
+    response.headers["X-DB-Queries"] = str(prof.count)
+    response.headers["X-DB-Time-Ms"] = f"{prof.db_time * 1000:.3f}"
+    response.headers["X-DB-Repeated"] = str(prof.repeated())
+
+    summary = prof.summary(response.status_code, elapsed)
+    recent.append(summary)
+    if prof.db_time * 1000 >= settings.SQL_PROFILE_SLOW_MS or prof.count >= settings.SQL_PROFILE_MAX_QUERIES:
+        log.warning(
+            "slow request %s %s: %d queries (%d repeated), %.1f ms in DB; top: %s",
+            prof.method, prof.path, prof.count, summary["repeated"], summary["db_ms"], summary["top"],
+        )
+    return response
@@ -1,20 +1,36 @@
-import base64
-from datetime import datetime
-from typing import Optional
+import contextlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
 import uuid
 
 import boto3
 from botocore.client import Config
+from botocore.exceptions import ClientError
 
+from app.metrics import evidence_upload_failures, evidence_upload_latency
 from app.settings import settings
+from app.tracing import span
 
 
 def s3_enabled() -> bool:
     return all([settings.S3_ENDPOINT, settings.S3_ACCESS_KEY, settings.S3_SECRET_KEY, settings.S3_BUCKET])
 
 
+_s3 = None
+
+
 def s3_client():
-    # Works for MinIO + S3
+    # Works for MinIO + S3. Building a client is expensive and they are thread-safe, so keep one
+    global _s3
+    if _s3 is None:
+        _s3 = _make_s3_client()
+    return _s3
+
+
+def _make_s3_client():
     return boto3.client(
         "s3",
         endpoint_url=settings.S3_ENDPOINT,
@@ -25,18 +41,130 @@ def s3_client():
     )
 
 
-def put_evidence_from_b64(evidence_b64: str, prefix: str = "evidence") -> Optional[str]:
-    if not s3_enabled():
+def storage_backend() -> Optional[str]:
+    """"s3", "local", or None when evidence can't be stored."""
+    if settings.STORAGE_BACKEND == "local":
+        return "local"
+    if s3_enabled():
+        return "s3"
+    return "local" if settings.STORAGE_BACKEND == "auto" else None
+
+
+def local_path(key: str) -> Optional[str]:
+    # keys come from the DB, but never resolve outside the storage root
+    root = os.path.realpath(settings.LOCAL_STORAGE_DIR)
+    path = os.path.realpath(os.path.join(root, key))
+    if not path.startswith(root + os.sep):
         return None
+    return path
 
-    raw = base64.b64decode(evidence_b64)
-    key = f"{prefix}/{datetime.utcnow().strftime('%Y/%m/%d')}/{uuid.uuid4().hex}.jpg"
 
-    cli = s3_client()
-    cli.put_object(
-        Bucket=settings.S3_BUCKET,
-        Key=key,
-        Body=raw,
-        ContentType="image/jpeg",
+def _put_local(key: str, raw: bytes):
+    # keys are sharded (content_key, or prefix/YYYY/MM/DD/uuid.jpg before dedup), so no directory grows unbounded
+    path = local_path(key)
+    d = os.path.dirname(path)
+    os.makedirs(d, exist_ok=True)
+    # write aside and rename: a reader never sees a half-written frame, a crash leaves only a .tmp
+    tmp = os.path.join(d, f".{uuid.uuid4().hex}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(tmp)
+        raise
+
+
+def presign_get(key: str, expires: Optional[int] = None) -> str:
+    return s3_client().generate_presigned_url(
+        "get_object", Params={"Bucket": settings.S3_BUCKET, "Key": key}, ExpiresIn=expires or settings.EVIDENCE_URL_TTL
     )
-    return key
\ No newline at end of file
+
+
+class PresignCache:
+    """
+    Presigned GET URLs by object key, reused until shortly before they expire
+    (the last fifth of EVIDENCE_URL_TTL, at least 30s, is never handed out).
+    Signing is cheap but not free, and a dashboard re-lists the same events
+    every few seconds. LRU-bounded at EVIDENCE_URL_CACHE_MAX keys.
+    """
+
+    def __init__(self):
+        self._urls: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str:
+        now = time.monotonic()
+        with self._lock:
+            hit = self._urls.get(key)
+            if hit is not None and hit[1] > now:
+                self._urls.move_to_end(key)
+                return hit[0]
+        ttl = settings.EVIDENCE_URL_TTL
+        url = presign_get(key, ttl)
+        with self._lock:
+            self._urls[key] = (url, now + ttl - max(30, ttl // 5))
+            self._urls.move_to_end(key)
+            while len(self._urls) > settings.EVIDENCE_URL_CACHE_MAX:
+                self._urls.popitem(last=False)
+        return url
+
+
+presign_cache = PresignCache()
+
+
+def evidence_urls(keys: Dict[int, str]) -> Dict[int, str]:
+    """event_id -> URL, for event_id -> object key: presigned on S3, else the
+    (authenticated) download route."""
+    if storage_backend() == "s3":
+        return {event_id: presign_cache.get(key) for event_id, key in keys.items()}
+    return {event_id: f"/events/{event_id}/evidence" for event_id in keys}
+
+
+def content_key(digest: str, prefix: str = "evidence") -> str:
+    # two levels of hash prefix keep directories (and S3 key ranges) evenly spread
+    return f"{prefix}/sha256/{digest[:2]}/{digest[2:4]}/{digest}.jpg"
+
+
+def put_object(key: str, raw: bytes):
+    t0 = time.perf_counter()
+    try:
+        with span("storage.put", bytes=len(raw)):
+            if storage_backend() == "local":
+                _put_local(key, raw)
+            else:
+                cli = s3_client()
+                cli.put_object(
+                    Bucket=settings.S3_BUCKET,
+                    Key=key,
+                    Body=raw,
+                    ContentType="image/jpeg",
+                )
+    except Exception:
+        evidence_upload_failures.inc()
+        raise
+    evidence_upload_latency.observe(value=time.perf_counter() - t0)
+
+
+def object_exists(key: str) -> bool:
+    if storage_backend() == "local":
+        path = local_path(key)
+        return path is not None and os.path.exists(path)
+    try:
+        s3_client().head_object(Bucket=settings.S3_BUCKET, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+    return True
+
+
+def delete_object(key: str):
+    path = local_path(key)
+    if path and os.path.exists(path):
+        os.unlink(path)
+    elif s3_enabled():
+        s3_client().delete_object(Bucket=settings.S3_BUCKET, Key=key)
@@ -0,0 +1,212 @@
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from fastapi import Request
+
+from app.settings import settings
+
+log = logging.getLogger(__name__)
+
+_TRACEPARENT = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# Routes recorded on every request (not just sampled ones) so a slow call
+# can still be exported with its per-stage breakdown
+_ALWAYS_RECORD = {"/agent/events"}
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """W3C traceparent -> (trace_id, parent span id, sampled), None if absent/invalid."""
+    if not value:
+        return None
+    m = _TRACEPARENT.match(value.strip().lower())
+    if not m or m.group(1) == "0" * 32 or m.group(2) == "0" * 16:
+        return None
+    return m.group(1), m.group(2), bool(int(m.group(3), 16) & 1)
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "t0", "ms", "attrs")
+
+    def __init__(self, trace: "Trace", name: str, parent_id: Optional[str], attrs: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.t0 = time.perf_counter()
+        self.ms: Optional[float] = None
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def end(self):
+        self.ms = (time.perf_counter() - self.t0) * 1000
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "offset_ms": round((self.t0 - self.trace.t0) * 1000, 3),
+            "ms": round(self.ms, 3) if self.ms is not None else None,
+            "attrs": self.attrs,
+        }
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Trace:
+    def __init__(self, trace_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.start = time.time()
+        self.t0 = time.perf_counter()
+        # appended from the event loop and threadpool workers; list.append is atomic
+        self.spans: List[Span] = []
+
+    def as_dict(self) -> Dict[str, Any]:
+        root = self.spans[0]
+        return {
+            "trace_id": self.trace_id,
+            "name": root.name,
+            "start": self.start,
+            "ms": round(root.ms or 0.0, 3),
+            "spans": [s.as_dict() for s in self.spans],
+        }
+
+    def breakdown(self) -> Dict[str, float]:
+        """ms per direct child of the root span, summed by name."""
+        root = self.spans[0]
+        out: Dict[str, float] = {}
+        for s in self.spans[1:]:
+            if s.parent_id == root.span_id and s.ms is not None:
+                out[s.name] = round(out.get(s.name, 0.0) + s.ms, 3)
+        return out
+
+
+_current: ContextVar[Optional[Span]] = ContextVar("trace_span", default=None)
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Any]:
+    """Child span of the current one; a no-op outside a recorded request."""
+    parent = _current.get()
+    if parent is None:
+        yield _NOOP
+        return
+    s = Span(parent.trace, name, parent.span_id, attrs)
+    parent.trace.spans.append(s)
+    token = _current.set(s)
+    try:
+        yield s
+    except Exception as e:
+        s.set(error=type(e).__name__)
+        raise
+    finally:
+        _current.reset(token)
+        s.end()
+
+
+class TraceExporter:
+    """
+    Keeps recent traces in memory and optionally appends them to a JSON lines
+    file. export() runs on the event loop, so the file is written by a
+    background thread; when it falls behind by `backlog` traces, new ones are
+    only kept in memory (counted in `dropped`).
+    """
+
+    def __init__(self, keep: int, path: Optional[str], backlog: int = 10000):
+        self.ring: Deque[Dict[str, Any]] = deque(maxlen=keep)
+        self.path = path
+        self.dropped = 0
+        self._queue: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=backlog)
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def export(self, trace: Trace):
+        doc = trace.as_dict()
+        self.ring.append(doc)
+        if not self.path:
+            return
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="trace-writer", daemon=True)
+                    self._writer.start()
+        try:
+            self._queue.put_nowait(doc)
+        except queue.Full:
+            self.dropped += 1
+
+    def _write_loop(self):
+        while True:
+            docs = [self._queue.get()]
+            while len(docs) < 500:
+                try:
+                    docs.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write("".join(json.dumps(d, default=str) + "\n" for d in docs))
+            except OSError:
+                log.exception("writing %d traces to %s failed", len(docs), self.path)
+
+    def recent(self, limit: int) -> List[Dict[str, Any]]:
+        return list(self.ring)[-limit:][::-1]
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        return next((t for t in reversed(self.ring) if t["trace_id"] == trace_id), None)
+
+
+exporter = TraceExporter(settings.TRACE_KEEP, settings.TRACE_FILE or None)
+
+
+async def trace_requests(request: Request, call_next):
+    parent = parse_traceparent(request.headers.get("traceparent"))
+    if parent is not None:
+        sampled = parent[2]
+    else:
+        sampled = settings.TRACE_SAMPLE_RATE > 0 and random.random() < settings.TRACE_SAMPLE_RATE
+    always = settings.TRACE_SLOW_INGEST_MS > 0 and request.url.path in _ALWAYS_RECORD
+    if not sampled and not always:
+        return await call_next(request)
+
+    trace = Trace(parent[0] if parent else os.urandom(16).hex(), sampled)
+    root = Span(trace, f"{request.method} {request.url.path}", parent[1] if parent else None, {})
+    trace.spans.append(root)
+    token = _current.set(root)
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        _current.reset(token)
+        root.end()
+        root.set(status=status)
+
+    slow = always and root.ms >= settings.TRACE_SLOW_INGEST_MS
+    if slow:
+        log.warning("slow ingest trace=%s %.1f ms: %s", trace.trace_id, root.ms, trace.breakdown())
+    if sampled or slow:
+        exporter.export(trace)
+    response.headers["traceparent"] = f"00-{trace.trace_id}-{root.span_id}-{'01' if sampled else '00'}"
+    return response
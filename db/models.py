@@ -3,7 +3,7 @@ from __future__ import annotations
 from datetime import datetime
 from sqlalchemy import (
     String, Text, DateTime, Boolean, ForeignKey,
-    Integer, Float, UniqueConstraint, Index
+    Integer, BigInteger, Float, UniqueConstraint, Index, func, text
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -31,6 +31,13 @@ class Site(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     org_id: Mapped[int] = mapped_column(ForeignKey("organizations.id", ondelete="CASCADE"), nullable=False)
     name: Mapped[str] = mapped_column(String(200), nullable=False)
+
+    # bumped on every camera change; served to agents as the /agent/config ETag
+    config_version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    # bumped on every guest write; guests.version takes the new value (agent delta sync)
+    guest_version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
     created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, nullable=False)
 
     org: Mapped["Organization"] = relationship(back_populates="sites")
@@ -81,6 +88,10 @@ class Agent(Base):
     name: Mapped[str] = mapped_column(String(200), nullable=False, default="edge-agent")
     version: Mapped[str | None] = mapped_column(String(50), nullable=True)
 
+    # ingest token bucket override (NULL = use settings defaults)
+    rate_limit_per_sec: Mapped[float | None] = mapped_column(Float, nullable=True)
+    rate_limit_burst: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
     last_seen: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, nullable=False)
 
@@ -108,6 +119,9 @@ class Camera(Base):
     enabled: Mapped[bool] = mapped_column(Boolean, nullable=False, default=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, nullable=False)
 
+    # seconds an event may stay open before it escalates (NULL = settings default)
+    escalation_seconds: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
     site: Mapped["Site"] = relationship(back_populates="cameras")
     events: Mapped[list["Event"]] = relationship(back_populates="camera", cascade="all, delete-orphan")
 
@@ -146,6 +160,12 @@ class Event(Base):
 
     notes: Mapped[str | None] = mapped_column(Text, nullable=True)
 
+    # loaded through /agent/backfill: history, never armed for live escalation
+    backfilled: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+
+    # insert time on the shard's own clock (ts is the agent's capture time); occupancy replays by it
+    created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now(), nullable=False)
+
     camera: Mapped["Camera"] = relationship(back_populates="events")
     evidence_items: Mapped[list["Evidence"]] = relationship(back_populates="event", cascade="all, delete-orphan")
 
@@ -153,6 +173,9 @@ class Event(Base):
         Index("ix_events_ts", "ts"),
         Index("ix_events_camera_ts", "camera_id", "ts"),
         Index("ix_events_status", "status"),
+        # escalation rebuilds its heap from open events at startup (alembic 0010)
+        Index("ix_events_open_ts", "ts", postgresql_where=text("status = 'open'")),
+        Index("ix_events_camera_created", "camera_id", "created_at"),
     )
 
 
@@ -169,6 +192,9 @@ class Evidence(Base):
     # bbox + face boxes + extra metadata
     annotations_json: Mapped[str | None] = mapped_column(Text, nullable=True)
 
+    # content digest of image_key (an evidence_blobs row); NULL for pre-dedup uuid keys
+    sha256: Mapped[str | None] = mapped_column(String(64), nullable=True)
+
     created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, nullable=False)
 
     event: Mapped["Event"] = relationship(back_populates="evidence_items")
@@ -178,6 +204,22 @@ class Evidence(Base):
     )
 
 
+class EvidenceBlob(Base):
+    __tablename__ = "evidence_blobs"
+
+    # one stored object per distinct frame, shared by every Evidence row with the same digest
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    object_key: Mapped[str] = mapped_column(Text, nullable=False)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    refcount: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, nullable=False)
+
+    __table_args__ = (
+        # sweep() looks for blobs nobody references any more (alembic 0011)
+        Index("ix_evidence_blobs_unreferenced", "sha256", postgresql_where=text("refcount <= 0")),
+    )
+
+
 class Guest(Base):
     __tablename__ = "guests"
 
@@ -192,6 +234,11 @@ class Guest(Base):
     # later: where their embeddings/images live
     folder_key: Mapped[str | None] = mapped_column(Text, nullable=True)
 
+    # sites.guest_version at this guest's last write
+    version: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    # soft delete, so agents syncing deltas learn about removals
+    deleted_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
     created_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, nullable=False)
 
     site: Mapped["Site"] = relationship(back_populates="guests")
@@ -199,4 +246,32 @@ class Guest(Base):
     __table_args__ = (
         Index("ix_guests_site_id", "site_id"),
         Index("ix_guests_expires_at", "expires_at"),
-    )
\ No newline at end of file
+        Index("ix_guests_site_version", "site_id", "version"),
+    )
+
+class BackfillWatermark(Base):
+    __tablename__ = "backfill_watermarks"
+
+    # no FK: lives in the agent's event shard, next to the rows it acknowledges
+    agent_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+
+    # highest backfill seq committed for this agent (resume point)
+    seq: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+
+
+class SiteOccupancy(Base):
+    __tablename__ = "site_occupancy"
+
+    # snapshot of the in-memory occupancy tracker (app/occupancy.py)
+    site_id: Mapped[int] = mapped_column(ForeignKey("sites.id", ondelete="CASCADE"), primary_key=True)
+
+    # {person_name: iso timestamp of entry}
+    present_json: Mapped[str] = mapped_column(Text, nullable=False, default="{}")
+    anonymous: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    # events created from here on are replayed unless listed in applied_json (a JSON list of event ids);
+    # everything created before it is reflected
+    watermark: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime(1970, 1, 1))
+    applied_json: Mapped[str] = mapped_column(Text, nullable=False, default="[]")
+
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=utcnow, nullable=False)
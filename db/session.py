@@ -1,7 +1,2 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-
-from .config import database_url
-
-ENGINE = create_engine(database_url(), pool_pre_ping=True)
-SessionLocal = sessionmaker(bind=ENGINE, autoflush=False, autocommit=False)
\ No newline at end of file
+# Single engine for the whole project: see app/db.py (pool settings live in app/settings.py)
+from app.db import engine as ENGINE, SessionLocal  # noqa: F401
@@ -1,9 +1,43 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+
+from app.camera_registry import camera_registry
+from app.guests import guest_registry
+from app.escalation import escalations
+from app.ingest import ingest_queue
+from app.liveness import agent_liveness
+from app.metrics import registry, track_http
+from app.occupancy import occupancy
+from app.replicas import replica_router, track_writes
+from app.sqlprofile import profile_sql
+from app.tracing import trace_requests
+from app.routers import auth, sites, cameras, events, ws, users, agents, admin, guests, embeddings, dashboard, occupancy as occupancy_router
+from app.settings import settings
+
 
-from app.routers import auth, sites, cameras, events, ws, users, agents
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await asyncio.to_thread(camera_registry.reload)
+    if settings.INGEST_GROUP_COMMIT:
+        await ingest_queue.start()
+    await guest_registry.start()
+    await occupancy.start()
+    await agent_liveness.start()
+    await escalations.start()
+    yield
+    await escalations.stop()
+    await agent_liveness.stop()
+    await occupancy.stop()
+    await guest_registry.stop()
+    # flush whatever is still buffered before the process exits
+    await ingest_queue.stop()
 
-app = FastAPI(title="Hostel Security API", version="0.1.0")
+
+app = FastAPI(title="Hostel Security API", version="0.1.0", lifespan=lifespan)
 
 # MVP CORS: tighten later
 app.add_middleware(
@@ -14,6 +48,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# read-your-writes: stamp writes so the client's next reads skip replicas
+if replica_router.replicas:
+    app.middleware("http")(track_writes)
+app.middleware("http")(track_http)
+# dev-only: BaseHTTPMiddleware costs every request a task group and body streaming
+if settings.SQL_PROFILE:
+    app.middleware("http")(profile_sql)
+# outermost: spans cover the other middlewares too
+app.middleware("http")(trace_requests)
+
 @app.get("/")
 def root():
     return {"ok": True, "service": "hostel-sec-api", "docs": "/docs"}
@@ -22,6 +66,11 @@ def root():
 def health():
     return {"status": "healthy"}
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 # Routers
 app.include_router(auth.router, tags=["auth"])
 app.include_router(users.router, tags=["users"])
@@ -29,4 +78,9 @@ app.include_router(sites.router, tags=["sites"])
 app.include_router(cameras.router, tags=["cameras"])
 app.include_router(events.router, tags=["events"])
 app.include_router(agents.router, tags=["agents"])
-app.include_router(ws.router, tags=["ws"])
\ No newline at end of file
+app.include_router(guests.router, tags=["guests"])
+app.include_router(embeddings.router, tags=["embeddings"])
+app.include_router(occupancy_router.router, tags=["occupancy"])
+app.include_router(dashboard.router, tags=["dashboard"])
+app.include_router(ws.router, tags=["ws"])
+app.include_router(admin.router, tags=["admin"])
\ No newline at end of file
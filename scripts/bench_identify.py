@@ -0,0 +1,66 @@
+"""
+Identify throughput vs gallery size: exact matmul vs the IVF index.
+
+Runs on synthetic clustered embeddings, no database or files needed:
+    python -m scripts.bench_identify --sizes 1000 10000 100000 --dim 512 --batch 1 16
+"""
+import argparse
+import time
+
+import numpy as np
+
+from app.identify import SiteIndex
+
+
+def gallery(n: int, dim: int, rnd: np.random.Generator) -> np.ndarray:
+    # people cluster loosely (lighting, age, ethnicity), which is what IVF exploits
+    centers = rnd.standard_normal((max(1, n // 50), dim)).astype(np.float32)
+    return centers[rnd.integers(0, len(centers), n)] + 0.6 * rnd.standard_normal((n, dim)).astype(np.float32)
+
+
+def bench(fn, min_seconds: float) -> float:
+    fn()  # warm up
+    calls, t0 = 0, time.perf_counter()
+    while time.perf_counter() - t0 < min_seconds:
+        fn()
+        calls += 1
+    return calls / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    ap.add_argument("--dim", type=int, default=512)
+    ap.add_argument("--batch", type=int, nargs="+", default=[1, 16])
+    ap.add_argument("--k", type=int, default=5)
+    ap.add_argument("--nprobe", type=int, default=8)
+    ap.add_argument("--dtype", choices=["float16", "float32"], default="float16")
+    ap.add_argument("--seconds", type=float, default=2.0)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    rnd = np.random.default_rng(args.seed)
+    print(f"{'gallery':>9} {'batch':>6} {'exact q/s':>11} {'ivf q/s':>11} {'recall@1':>9} {'build s':>8}")
+    for n in args.sizes:
+        mat = gallery(n, args.dim, rnd).astype(args.dtype)
+        ids = np.arange(n)
+        t0 = time.perf_counter()
+        index = SiteIndex(1, ids, np.zeros(n, dtype="u1"), np.zeros(n, dtype="S64"), mat, nlist=int(np.sqrt(n)))
+        build = time.perf_counter() - t0
+        for b in args.batch:
+            # queries: noisy copies of gallery rows, like a fresh capture of a known face
+            q = mat[rnd.integers(0, n, b)].astype(np.float32) + 0.3 * rnd.standard_normal((b, args.dim)).astype(np.float32)
+            exact_qps = b * bench(lambda: index.search(q, args.k, exact=True), args.seconds)
+            if index.centroids is not None:
+                ivf_qps = b * bench(lambda: index.search(q, args.k, nprobe=args.nprobe), args.seconds)
+                truth = index.search(q, 1, exact=True)[0][:, 0]
+                got = index.search(q, 1, nprobe=args.nprobe)[0][:, 0]
+                recall = f"{(truth == got).mean():9.3f}"
+                ivf = f"{ivf_qps:11.0f}"
+            else:
+                recall, ivf = f"{'-':>9}", f"{'-':>11}"
+            print(f"{n:>9} {b:>6} {exact_qps:11.0f} {ivf} {recall} {build:8.2f}")
+
+
+if __name__ == "__main__":
+    main()
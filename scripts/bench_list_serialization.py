@@ -0,0 +1,85 @@
+"""
+Micro-benchmark: list endpoint serialization, ORM + response_model vs Core + orjson.
+
+Uses an in-memory SQLite copy of the schema so it runs without Postgres:
+    python -m scripts.bench_list_serialization --rows 500 --repeat 200
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session
+
+from app.fastpath import EVENT_COLUMNS, rows_response
+from app.schemas import EventOut
+from db.base import Base
+from db.models import Event
+
+
+def _seed(engine, n: int):
+    rnd = random.Random(7)
+    t0 = datetime(2026, 1, 1)
+    rows = [
+        {
+            "camera_id": rnd.randint(1, 20),
+            "ts": t0 + timedelta(seconds=i, microseconds=rnd.randint(0, 999999)),
+            "type": rnd.choice(["entry", "exit", "unknown"]),
+            "person_name": rnd.choice([None, "alice", "bob", "carol"]),
+            "similarity": rnd.choice([None, rnd.random()]),
+            "status": rnd.choice(["open", "dealt", "ignored"]),
+        }
+        for i in range(n)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(Event), rows)
+
+
+def orm_path(engine, adapter: TypeAdapter, limit: int) -> bytes:
+    # what the endpoints did: ORM entities -> response_model validation -> JSONResponse
+    with Session(engine) as db:
+        objs = db.scalars(select(Event).order_by(Event.ts.desc()).limit(limit)).all()
+        content = adapter.dump_python(adapter.validate_python(objs, from_attributes=True), mode="json")
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def fast_path(engine, limit: int) -> bytes:
+    with Session(engine) as db:
+        rows = db.execute(select(*EVENT_COLUMNS).order_by(Event.ts.desc()).limit(limit)).all()
+        return rows_response(rows).body
+
+
+def bench(label: str, fn, repeat: int) -> float:
+    fn()  # warm up
+    t = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    per_call = (time.perf_counter() - t) / repeat
+    print(f"{label:<28} {per_call * 1000:8.3f} ms/call")
+    return per_call
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=500)
+    ap.add_argument("--repeat", type=int, default=200)
+    args = ap.parse_args()
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    _seed(engine, args.rows)
+    adapter = TypeAdapter(list[EventOut])
+
+    # both paths must produce the same document
+    assert json.loads(orm_path(engine, adapter, args.rows)) == json.loads(fast_path(engine, args.rows))
+
+    slow = bench("ORM + response_model", lambda: orm_path(engine, adapter, args.rows), args.repeat)
+    fast = bench("Core columns + orjson", lambda: fast_path(engine, args.rows), args.repeat)
+    print(f"speedup: {slow / fast:.1f}x at {args.rows} rows")
+
+
+if __name__ == "__main__":
+    main()
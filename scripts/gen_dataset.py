@@ -0,0 +1,316 @@
+"""
+Synthetic dataset at production scale, for query-plan and index work.
+
+    python -m scripts.gen_dataset --sites 300 --cameras 3000 --events 5000000 --days 180 --seed 7
+
+Fills organizations, sites, cameras, agents, users (admins + guards),
+guests, events and evidence. Small tables go in with multi-row INSERTs;
+events, evidence and guests are streamed with COPY, one transaction per
+generated day, onto each site's event shard. RETURNING keeps parameter order
+so the random stream, and with it the output, is stable.
+
+The same --seed and --end produce the same rows. Names are unique per
+--prefix, so load a second dataset into the same database with another one.
+
+Skew, roughly what real hostels look like:
+- site traffic follows a Zipf curve (a few very busy sites, a long tail)
+- each site's main entrance takes most of its traffic, other entries less, exits least
+- daily peaks in the morning and the evening
+- old events are nearly all dealt/ignored; the last day still has many open ones
+"""
+import argparse
+import random
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from sqlalchemy import insert
+
+from app.db import SessionLocal
+from app.security import hash_password
+from app.shards import Shard, shard_router
+from db.models import Agent, Camera, Organization, Site, User
+
+# relative traffic per hour of day (local time is assumed to be UTC)
+HOURLY = [1, 1, 1, 1, 1, 2, 4, 9, 12, 8, 5, 4, 5, 5, 4, 4, 5, 8, 11, 12, 10, 7, 4, 2]
+
+# ids are reserved from the shard's sequence this many at a time
+ID_BLOCK = 50_000
+
+
+@dataclass
+class Cam:
+    id: int
+    site_id: int
+    role: str
+    weight: float
+
+
+class IdAllocator:
+    """
+    Reserves event ids from a shard's sequence in blocks, respecting its
+    increment (shards interleave ids), so evidence rows can reference events
+    without reading ids back. Not safe against concurrent writers to the same
+    shard; run it against a database that is not taking traffic.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.step = db.exec_driver_sql(
+            "SELECT increment_by FROM pg_sequences WHERE sequencename = 'events_id_seq'"
+        ).scalar() or 1
+        self.next = 0
+        self.left = 0
+
+    def take(self) -> int:
+        if self.left == 0:
+            first = self.db.exec_driver_sql("SELECT nextval('events_id_seq')").scalar()
+            self.db.exec_driver_sql(
+                "SELECT setval('events_id_seq', %(last)s)", {"last": first + (ID_BLOCK - 1) * self.step}
+            )
+            self.next, self.left = first, ID_BLOCK
+        i = self.next
+        self.next += self.step
+        self.left -= 1
+        return i
+
+
+def zipf_weights(n: int, s: float, rnd: random.Random) -> List[float]:
+    w = [1.0 / (k + 1) ** s for k in range(n)]
+    rnd.shuffle(w)
+    return w
+
+
+def split(total: int, weights: List[float], minimum: int) -> List[int]:
+    """Integer split of total proportional to weights, each part >= minimum."""
+    spare = max(0, total - minimum * len(weights))
+    tw = sum(weights)
+    parts = [minimum + int(spare * w / tw) for w in weights]
+    for i in range(total - sum(parts)):
+        parts[i % len(parts)] += 1
+    return parts
+
+
+def seed_primary(args, rnd: random.Random) -> Tuple[List[Cam], Dict[int, List[int]], List[int]]:
+    pw_hash = hash_password(args.password)
+    key_hash = hash_password(args.agent_key)
+    site_weights = zipf_weights(args.sites, 1.1, rnd)
+
+    with SessionLocal() as db:
+        org_ids = db.scalars(
+            insert(Organization).returning(Organization.id, sort_by_parameter_order=True),
+            [{"name": f"{args.prefix}-org-{i}", "created_at": args.start} for i in range(args.orgs)],
+        ).all()
+        site_rows = db.execute(
+            insert(Site).returning(Site.id, Site.org_id, sort_by_parameter_order=True),
+            [
+                {"org_id": org_ids[i % len(org_ids)], "name": f"{args.prefix}-site-{i}", "created_at": args.start}
+                for i in range(args.sites)
+            ],
+        ).all()
+        site_ids = [r.id for r in site_rows]
+        site_weight = dict(zip(site_ids, site_weights))
+
+        # busier sites get more cameras too
+        per_site = split(args.cameras, site_weights, 2)
+        cam_rows = []
+        for sid, n in zip(site_ids, per_site):
+            for j in range(n):
+                role = "entry" if j == 0 or (j < n - 1 and rnd.random() < 0.5) else "exit"
+                cam_rows.append(
+                    {
+                        "site_id": sid,
+                        "name": "Main entrance" if j == 0 else f"{role}-{j}",
+                        "role": role,
+                        "stream_url": f"rtsp://10.{sid % 256}.{j % 256}.1/stream",
+                        "enabled": rnd.random() > 0.03,
+                        "created_at": args.start,
+                    }
+                )
+        cam_ids = db.execute(
+            insert(Camera).returning(Camera.id, Camera.site_id, Camera.role, Camera.name, sort_by_parameter_order=True),
+            cam_rows,
+        ).all()
+
+        cams = []
+        for c in cam_ids:
+            w = 6.0 if c.name == "Main entrance" else 2.0 if c.role == "entry" else 1.0
+            cams.append(Cam(c.id, c.site_id, c.role, w))
+        # camera weight within site x site weight
+        site_cam_total: Dict[int, float] = defaultdict(float)
+        for c in cams:
+            site_cam_total[c.site_id] += c.weight
+        for c in cams:
+            c.weight = site_weight[c.site_id] * c.weight / site_cam_total[c.site_id]
+
+        db.execute(
+            insert(Agent),
+            [
+                {"site_id": sid, "name": f"edge-{sid}", "version": "1.0.0", "api_key_hash": key_hash, "created_at": args.start}
+                for sid in site_ids
+            ],
+        )
+
+        org_of = {r.id: r.org_id for r in site_rows}
+        users = [
+            {"org_id": oid, "site_id": None, "name": f"admin-{i}", "email": f"admin-{i}@{args.prefix}.example",
+             "password_hash": pw_hash, "role": "ADMIN", "is_active": True, "created_at": args.start}
+            for i, oid in enumerate(org_ids)
+        ]
+        users += [
+            {"org_id": org_of[sid], "site_id": sid, "name": f"guard-{sid}-{k}", "email": f"guard-{sid}-{k}@{args.prefix}.example",
+             "password_hash": pw_hash, "role": "GUARD", "is_active": rnd.random() > 0.05, "created_at": args.start}
+            for sid in site_ids
+            for k in range(args.guards_per_site)
+        ]
+        user_rows = db.execute(insert(User).returning(User.id, User.site_id, sort_by_parameter_order=True), users).all()
+        guards: Dict[int, List[int]] = defaultdict(list)
+        for u in user_rows:
+            if u.site_id is not None:
+                guards[u.site_id].append(u.id)
+
+        # guests: COPY, there can be a lot of them
+        raw = db.connection().connection.driver_connection
+        with raw.cursor() as cur:
+            with cur.copy("COPY guests (site_id, name, contact, expires_at, folder_key, created_at) FROM STDIN") as cp:
+                for sid in site_ids:
+                    for g in range(args.guests_per_site):
+                        created = args.end - timedelta(days=rnd.uniform(0, args.days))
+                        cp.write_row((
+                            sid,
+                            f"guest-{sid}-{g}",
+                            f"+1555{rnd.randrange(10**7):07d}" if rnd.random() < 0.7 else None,
+                            created + timedelta(days=rnd.choice((1, 2, 3, 7, 14, 30))),
+                            None,
+                            created,
+                        ))
+        db.commit()
+
+    return cams, guards, site_ids
+
+
+def event_row(rnd: random.Random, ts: datetime, cam: Cam, guard_ids: List[int], end: datetime, residents: int):
+    if rnd.random() < 0.12:
+        etype = "unknown"
+    else:
+        etype = "entry" if cam.role == "entry" else "exit"
+
+    if etype != "unknown" and rnd.random() < 0.75:
+        person = f"resident-{cam.site_id}-{int(rnd.paretovariate(1.2)) % residents}"
+        similarity = round(rnd.uniform(0.62, 0.99), 4)
+    else:
+        person = None
+        similarity = round(rnd.uniform(0.2, 0.6), 4) if rnd.random() < 0.5 else None
+
+    age = end - ts
+    r = rnd.random()
+    if age < timedelta(days=1):
+        status = "open" if r < 0.4 else "dealt" if r < 0.85 else "ignored"
+    else:
+        status = "open" if r < 0.02 else "dealt" if r < 0.72 else "ignored"
+
+    decision = handled_by = handled_at = notes = None
+    if status == "dealt":
+        decision = "entry_granted" if rnd.random() < 0.9 else "entry_denied"
+        handled_at = ts + timedelta(seconds=rnd.expovariate(1 / 90))
+        handled_by = rnd.choice(guard_ids) if guard_ids else None
+        if decision == "entry_denied" and rnd.random() < 0.5:
+            notes = "denied at gate"
+    return etype, person, similarity, status, decision, handled_by, handled_at, notes
+
+
+_EVENT_COPY = (
+    "COPY events (id, camera_id, ts, type, person_name, similarity, status, decision, "
+    "handled_by_user_id, handled_at, notes) FROM STDIN"
+)
+_EVIDENCE_COPY = "COPY evidence (event_id, image_key, thumb_key, annotations_json, created_at) FROM STDIN"
+
+
+def generate_events(args, rnd: random.Random, cams: List[Cam], guards: Dict[int, List[int]]) -> int:
+    shard_of: Dict[int, Shard] = {c.id: shard_router.for_site(c.site_id) for c in cams}
+    sessions = {s.index: s.Session() for s in shard_router.shards}
+    ids = {i: IdAllocator(db) for i, db in sessions.items()}
+    weights = [c.weight for c in cams]
+    written = 0
+    t_start = time.perf_counter()
+
+    try:
+        per_day = split(args.events, [1.0] * args.days, 0)
+        for d, n in enumerate(per_day):
+            day = args.start + timedelta(days=d)
+            picks = rnd.choices(cams, weights=weights, k=n)
+            hours = rnd.choices(range(24), weights=HOURLY, k=n)
+            stamps = sorted(
+                (day + timedelta(hours=h, seconds=rnd.random() * 3600), c) for h, c in zip(hours, picks)
+            )
+
+            by_shard: Dict[int, List[tuple]] = defaultdict(list)
+            evidence: Dict[int, List[tuple]] = defaultdict(list)
+            for ts, cam in stamps:
+                idx = shard_of[cam.id].index
+                eid = ids[idx].take()
+                row = event_row(rnd, ts, cam, guards.get(cam.site_id, []), args.end, args.residents)
+                by_shard[idx].append((eid, cam.id, ts) + row)
+                if rnd.random() < args.evidence_ratio:
+                    key = f"evidence/{ts:%Y/%m/%d}/{rnd.getrandbits(128):032x}.jpg"
+                    evidence[idx].append((eid, key, None, None, ts))
+
+            for idx, rows in by_shard.items():
+                raw = sessions[idx].connection().connection.driver_connection
+                with raw.cursor() as cur:
+                    with cur.copy(_EVENT_COPY) as cp:
+                        for r in rows:
+                            cp.write_row(r)
+                    with cur.copy(_EVIDENCE_COPY) as cp:
+                        for r in evidence[idx]:
+                            cp.write_row(r)
+                sessions[idx].commit()
+
+            written += n
+            rate = written / (time.perf_counter() - t_start) * 60
+            print(f"day {d + 1}/{args.days}: {written} events ({rate:,.0f}/min)", flush=True)
+    finally:
+        for db in sessions.values():
+            db.close()
+    return written
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--prefix", default="synthetic")
+    ap.add_argument("--orgs", type=int, default=1)
+    ap.add_argument("--sites", type=int, default=100)
+    ap.add_argument("--cameras", type=int, default=1000)
+    ap.add_argument("--events", type=int, default=1_000_000)
+    ap.add_argument("--days", type=int, default=90)
+    ap.add_argument("--end", default=None, help="last generated day, YYYY-MM-DD (default: today, UTC)")
+    ap.add_argument("--evidence-ratio", type=float, default=0.3)
+    ap.add_argument("--guards-per-site", type=int, default=3)
+    ap.add_argument("--guests-per-site", type=int, default=50)
+    ap.add_argument("--residents", type=int, default=200, help="distinct recognised names per site")
+    ap.add_argument("--password", default="synthetic-pw")
+    ap.add_argument("--agent-key", default="synthetic-agent-key")
+    args = ap.parse_args()
+
+    end_day = datetime.strptime(args.end, "%Y-%m-%d") if args.end else datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    args.end = end_day + timedelta(days=1)
+    args.start = args.end - timedelta(days=args.days)
+    if args.cameras < 2 * args.sites:
+        ap.error("need at least 2 cameras per site")
+
+    rnd = random.Random(args.seed)
+    t0 = time.perf_counter()
+    cams, guards, site_ids = seed_primary(args, rnd)
+    print(f"{args.orgs} orgs, {len(site_ids)} sites, {len(cams)} cameras, guests and users in {time.perf_counter() - t0:.1f} s")
+
+    n = generate_events(args, rnd, cams, guards)
+    elapsed = time.perf_counter() - t0
+    print(f"done: {n} events in {elapsed:.1f} s ({n / elapsed * 60:,.0f}/min)")
+    print("run ANALYZE before looking at plans")
+
+
+if __name__ == "__main__":
+    main()
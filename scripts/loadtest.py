@@ -0,0 +1,333 @@
+"""
+End-to-end load harness: N agents push events, M dashboards listen on the
+WebSocket, G guards poll the event list, all against a real uvicorn process.
+
+    python -m scripts.loadtest --agents 20 --dashboards 5 --guards 5 --duration 30 --out results.json
+
+Needs a migrated database (DATABASE_URL, or --database-url) and the client
+libraries httpx and websockets (the latter ships with uvicorn[standard]).
+Evidence goes to a temporary directory (STORAGE_BACKEND=local), so no S3 is
+needed. Every run seeds its own org/sites/cameras/agents/guards under a
+unique name and leaves them in place; point it at a scratch database.
+
+Reports throughput, error counts and p50/p95/p99 per endpoint plus
+ingest-to-dashboard delivery latency, and writes the same numbers as JSON
+so runs can be compared (--compare previous.json prints the deltas).
+
+The broadcaster is per process: with --workers > 1 a dashboard only sees
+events ingested by the worker it is connected to.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import math
+import os
+import random
+import secrets
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import httpx
+import websockets
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.security import hash_password
+from app.settings import settings
+from db.models import Agent, Camera, Organization, Site, User
+
+# random bytes stand in for a frame; the server only decodes and stores them
+_EVIDENCE_BYTES = 40_000
+
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"n": 0, "p50": None, "p95": None, "p99": None, "max": None}
+    s = sorted(values)
+
+    def at(p: float) -> float:
+        # nearest rank
+        return round(s[max(0, math.ceil(p * len(s)) - 1)], 3)
+
+    return {"n": len(s), "p50": at(0.50), "p95": at(0.95), "p99": at(0.99), "max": round(s[-1], 3)}
+
+
+class Stats:
+    def __init__(self):
+        self.latency: Dict[str, List[float]] = defaultdict(list)
+        self.status: Dict[str, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self.delivery: List[float] = []
+        # marker -> perf_counter at send, for ingest-to-dashboard latency
+        self.sent_at: Dict[str, float] = {}
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def record(self, name: str, started: float, status: int):
+        self.latency[name].append((time.perf_counter() - started) * 1000)
+        self.status[name][status] += 1
+
+
+def seed(db_url: str, n_sites: int, cams_per_site: int, n_agents: int, n_guards: int, password: str) -> Dict[str, Any]:
+    run = secrets.token_hex(4)
+    engine = create_engine(db_url)
+    with Session(engine) as db:
+        org = Organization(name=f"loadtest-{run}")
+        db.add(org)
+        db.flush()
+        sites = [Site(org_id=org.id, name=f"site-{i}") for i in range(n_sites)]
+        db.add_all(sites)
+        db.flush()
+        cams = [
+            Camera(site_id=s.id, name=f"cam-{j}", role="entry" if j % 2 == 0 else "exit", enabled=True)
+            for s in sites
+            for j in range(cams_per_site)
+        ]
+        db.add_all(cams)
+
+        # one argon2 hash reused by every agent: hashing is the slow part of seeding
+        key = secrets.token_urlsafe(24)
+        key_hash = hash_password(key)
+        agents = [Agent(site_id=sites[i % n_sites].id, name=f"lt-agent-{i}", api_key_hash=key_hash) for i in range(n_agents)]
+        db.add_all(agents)
+
+        pw_hash = hash_password(password)
+        guards = [
+            User(
+                org_id=org.id,
+                site_id=sites[i % n_sites].id,
+                name=f"guard-{i}",
+                email=f"guard-{i}-{run}@loadtest.local",
+                password_hash=pw_hash,
+                role="GUARD",
+                is_active=True,
+            )
+            for i in range(n_guards)
+        ]
+        db.add_all(guards)
+        db.commit()
+
+        cams_by_site = defaultdict(list)
+        for c in cams:
+            cams_by_site[c.site_id].append(c.id)
+        out = {
+            "run": run,
+            "agents": [{"id": a.id, "key": key, "cameras": cams_by_site[a.site_id]} for a in agents],
+            "guards": [g.email for g in guards],
+        }
+    engine.dispose()
+    return out
+
+
+def start_server(port: int, db_url: str, storage_dir: str, workers: int) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update(
+        DATABASE_URL=db_url,
+        STORAGE_BACKEND="local",
+        LOCAL_STORAGE_DIR=storage_dir,
+        # measure the service, not the limiter
+        INGEST_AGENT_RATE_PER_SEC="0",
+        INGEST_SITE_RATE_PER_SEC="0",
+    )
+    cmd = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    return subprocess.Popen(cmd, env=env)
+
+
+async def wait_ready(base: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base) as c:
+        while time.monotonic() < deadline:
+            try:
+                if (await c.get("/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"server at {base} did not become ready")
+
+
+async def agent_loop(c: httpx.AsyncClient, ag: Dict[str, Any], rate: float, evidence_ratio: float, stop: float, st: Stats, rnd: random.Random):
+    headers = {"X-Agent-Id": str(ag["id"]), "X-Agent-Key": ag["key"]}
+    # evidence is content-addressed, so every frame must differ or only the first one is uploaded;
+    # a unique 12-byte head (a multiple of 3, so the base64 halves concatenate) on a shared random body
+    frame_body = base64.b64encode(os.urandom(_EVIDENCE_BYTES)).decode()
+    seq = 0
+    while time.monotonic() < stop:
+        seq += 1
+        marker = f"lt-{ag['id']}-{seq}"
+        with_evidence = rnd.random() < evidence_ratio
+        body = {
+            "camera_id": rnd.choice(ag["cameras"]),
+            "type": rnd.choice(["entry", "exit", "unknown"]),
+            "person_name": marker,
+            "similarity": round(rnd.random(), 3),
+        }
+        if with_evidence:
+            head = ag["id"].to_bytes(4, "big") + seq.to_bytes(8, "big")
+            body["evidence_b64"] = base64.b64encode(head).decode() + frame_body
+        name = "POST /agent/events" + (" +evidence" if with_evidence else "")
+        t0 = time.perf_counter()
+        st.sent_at[marker] = t0
+        try:
+            r = await c.post("/agent/events", json=body, headers=headers)
+            st.record(name, t0, r.status_code)
+        except httpx.HTTPError as e:
+            st.errors[type(e).__name__] += 1
+        # open-loop-ish pacing with jitter so agents don't march in lockstep
+        await asyncio.sleep(rnd.expovariate(rate))
+
+
+async def dashboard_loop(ws_url: str, stop: float, st: Stats):
+    try:
+        async with websockets.connect(ws_url, max_size=None) as ws:
+            while time.monotonic() < stop:
+                try:
+                    raw = await asyncio.wait_for(ws.recv(), timeout=max(0.1, stop - time.monotonic()))
+                except asyncio.TimeoutError:
+                    break
+                now = time.perf_counter()
+                msg = json.loads(raw)
+                if msg.get("type") != "event_created":
+                    continue
+                sent = st.sent_at.get(msg["event"].get("person_name") or "")
+                if sent is not None:
+                    st.delivery.append((now - sent) * 1000)
+    except Exception as e:
+        st.errors[f"ws:{type(e).__name__}"] += 1
+
+
+async def guard_loop(c: httpx.AsyncClient, email: str, password: str, interval: float, stop: float, st: Stats):
+    t0 = time.perf_counter()
+    r = await c.post("/auth/login", data={"username": email, "password": password})
+    st.record("POST /auth/login", t0, r.status_code)
+    if r.status_code != 200:
+        return
+    headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+    while time.monotonic() < stop:
+        t0 = time.perf_counter()
+        try:
+            r = await c.get("/events", params={"limit": 50}, headers=headers)
+            st.record("GET /events", t0, r.status_code)
+        except httpx.HTTPError as e:
+            st.errors[type(e).__name__] += 1
+        await asyncio.sleep(interval)
+
+
+async def run(args, base: str, seeded: Dict[str, Any]) -> Dict[str, Any]:
+    st = Stats()
+    rnd = random.Random(args.seed)
+    ws_url = base.replace("http", "ws", 1) + "/ws/events"
+    limits = httpx.Limits(max_connections=args.agents + args.guards + 10)
+
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=30.0) as c:
+        # dashboards first so they see the very first events
+        stop = time.monotonic() + args.duration + 2
+        dashboards = [asyncio.create_task(dashboard_loop(ws_url, stop, st)) for _ in range(args.dashboards)]
+        await asyncio.sleep(0.5)
+
+        started = time.monotonic()
+        stop = started + args.duration
+        tasks = [
+            agent_loop(c, ag, args.rate, args.evidence_ratio, stop, st, random.Random(rnd.random()))
+            for ag in seeded["agents"]
+        ]
+        tasks += [guard_loop(c, g, args.password, args.poll_interval, stop, st) for g in seeded["guards"]]
+        await asyncio.gather(*tasks)
+        elapsed = time.monotonic() - started
+        await asyncio.gather(*dashboards)
+
+    ok = sum(n for name, codes in st.status.items() if name.startswith("POST /agent/events") for code, n in codes.items() if code == 200)
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("password", "database_url")},
+        "run": seeded["run"],
+        "elapsed_s": round(elapsed, 3),
+        "ingest_ok": ok,
+        "ingest_per_s": round(ok / elapsed, 2) if elapsed else 0.0,
+        "delivery_ms": percentiles(st.delivery),
+        "endpoints": {
+            name: {**percentiles(vals), "status": {str(k): v for k, v in st.status[name].items()}}
+            for name, vals in sorted(st.latency.items())
+        },
+        "errors": dict(st.errors),
+    }
+
+
+def print_report(res: Dict[str, Any], prev: Optional[Dict[str, Any]] = None):
+    def delta(path: List[str], cur: Optional[float]) -> str:
+        if prev is None or cur is None:
+            return ""
+        old: Any = prev
+        for p in path:
+            old = old.get(p) if isinstance(old, dict) else None
+        if not old:
+            return ""
+        return f" ({(cur - old) / old * 100:+.1f}%)"
+
+    print(f"ingest: {res['ingest_ok']} ok in {res['elapsed_s']} s = {res['ingest_per_s']}/s{delta(['ingest_per_s'], res['ingest_per_s'])}")
+    rows = [("ingest -> dashboard", res["delivery_ms"], ["delivery_ms"])]
+    rows += [(name, v, ["endpoints", name]) for name, v in res["endpoints"].items()]
+    print(f"{'':<30} {'n':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, v, path in rows:
+        cells = [f"{v[p]:>9}" if v[p] is not None else f"{'-':>9}" for p in ("p50", "p95", "p99")]
+        print(f"{name:<30} {v['n']:>7} {' '.join(cells)}{delta(path + ['p95'], v['p95'])}")
+        if "status" in v:
+            bad = {k: n for k, n in v["status"].items() if k != "200"}
+            if bad:
+                print(f"{'':<30} non-200: {bad}")
+    if res["errors"]:
+        print("errors:", res["errors"])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--agents", type=int, default=10)
+    ap.add_argument("--dashboards", type=int, default=3)
+    ap.add_argument("--guards", type=int, default=3)
+    ap.add_argument("--sites", type=int, default=3)
+    ap.add_argument("--cameras-per-site", type=int, default=4)
+    ap.add_argument("--duration", type=float, default=20.0)
+    ap.add_argument("--rate", type=float, default=5.0, help="events/s per agent")
+    ap.add_argument("--evidence-ratio", type=float, default=0.2)
+    ap.add_argument("--poll-interval", type=float, default=1.0)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--workers", type=int, default=1)
+    ap.add_argument("--url", help="target an already running server instead of starting one")
+    ap.add_argument("--database-url", default=settings.DATABASE_URL)
+    ap.add_argument("--password", default="loadtest-pw")
+    ap.add_argument("--out", default="loadtest-results.json")
+    ap.add_argument("--compare", help="previous results JSON to diff against")
+    args = ap.parse_args()
+
+    seeded = seed(args.database_url, args.sites, args.cameras_per_site, args.agents, args.guards, args.password)
+
+    server = None
+    with tempfile.TemporaryDirectory(prefix="loadtest-evidence-") as storage_dir:
+        if args.url:
+            base = args.url.rstrip("/")
+        else:
+            base = f"http://127.0.0.1:{args.port}"
+            server = start_server(args.port, args.database_url, storage_dir, args.workers)
+        try:
+            asyncio.run(wait_ready(base))
+            res = asyncio.run(run(args, base, seeded))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait(timeout=10)
+
+    prev = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            prev = json.load(f)
+    print_report(res, prev)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(res, f, indent=2)
+    print(f"results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()